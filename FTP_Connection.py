@@ -1,37 +1,47 @@
 import os
+import posixpath
 import logging
+import collections
 import configparser
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from ftplib import FTP
+from ftplib import FTP, all_errors, error_perm
+from contextlib import contextmanager
+import functools
+import heapq
+import itertools
 import threading
-import io
 import time
 
-FIRST_RUN_FILE = 'connections.ini'
+from FTP_cipher import EncryptingReader, XorCipher, xor_cipher  # noqa: F401
+from FTP_logging import setup_logging
 
-# Configuração do log
-logging.basicConfig(
-    level=logging.INFO,
-    filename='ftp_client.log',
-    filemode='w',
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-console = logging.StreamHandler()
-console.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-logging.getLogger().addHandler(console)
+FIRST_RUN_FILE = 'connections.ini'
+# Transferências parciais usam este sufixo até serem concluídas
+PARTIAL_SUFFIX = '.part'
+# Downloads segmentados pré-alocam o arquivo inteiro; ele nunca é retomado
+SEGMENTED_SUFFIX = '.segpart'
+# Arquivos menores são reenviados do zero, sem SIZE/RNTO extras
+RESUME_MIN_SIZE = 8 * 1024 * 1024
+# Novas tentativas automáticas das filas de transferência e seu backoff
+TRANSFER_RETRIES = 3
+RETRY_BACKOFF = 1.0
+RETRY_BACKOFF_MAX = 30.0
+# Downloads segmentados: tamanho mínimo de cada faixa e bloco de leitura
+SEGMENT_MIN_SIZE = 16 * 1024 * 1024
+SEGMENT_BLOCK_SIZE = 256 * 1024
+# Listagens remotas: validade do cache, itens por página e fatos pedidos ao MLSD
+LISTING_TTL = 30.0
+LISTING_PAGE_SIZE = 500
+LISTING_FACTS = ['type', 'size', 'modify']
+
+# Log do cliente gravado por uma thread dedicada, com rotação por tamanho
+CLIENT_LOG_MAX_BYTES = 5 * 1024 * 1024
+setup_logging('ftp_client.log', logging.INFO, max_bytes=CLIENT_LOG_MAX_BYTES, backup_count=3)
 
 logger = logging.getLogger(__name__)
 
 
-def xor_cipher(data: bytes, key: str) -> bytes:
-    """Encrypt or decrypt data using a simple XOR cipher."""
-    if not key:
-        return data
-    key_bytes = key.encode('utf-8')
-    return bytes(b ^ key_bytes[i % len(key_bytes)] for i, b in enumerate(data))
-
-
 # Função para carregar as configurações de conexão do arquivo connections.ini
 def load_ftp_config():
     config = configparser.ConfigParser()
@@ -50,6 +60,394 @@ def load_ftp_config():
         raise  # Re-raise a exceção para que o programa possa lidar com isso
 
 
+# Função para carregar as configurações do pool de sessões
+def load_pool_config():
+    config = configparser.ConfigParser()
+    config.read(FIRST_RUN_FILE)
+    pool_size = config.getint('FTP', 'pool_size', fallback=4)
+    idle_timeout = config.getfloat('FTP', 'pool_idle_timeout', fallback=60.0)
+    return pool_size, idle_timeout
+
+
+class FTPSessionPool:
+    """Thread-safe pool of logged-in FTP sessions.
+
+    Sessions are borrowed with :meth:`session` (or :meth:`acquire` and
+    :meth:`release`) and reused across operations. A session idle for more
+    than ``health_check_interval`` seconds is probed with NOOP before being
+    handed out, broken sessions are replaced by a fresh connection and
+    sessions idle for more than ``idle_timeout`` seconds are closed.
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        user,
+        password,
+        size=4,
+        idle_timeout=60.0,
+        health_check_interval=15.0,
+        encryption_enabled=False,
+        key='',
+        factory=FTP,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        # Configurações de transferência do mesmo perfil de conexão
+        self.encryption_enabled = encryption_enabled
+        self.key = key
+        self.factory = factory
+        self._idle = []
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        ftp = self.factory()
+        ftp.connect(self.host, self.port)
+        ftp.login(self.user, self.password)
+        return ftp
+
+    @staticmethod
+    def _quit(ftp):
+        try:
+            ftp.quit()
+        except Exception:
+            try:
+                ftp.close()
+            except Exception:
+                pass
+
+    def _evict_idle(self, now):
+        expired = [item for item in self._idle if now - item[1] > self.idle_timeout]
+        if expired:
+            self._idle = [item for item in self._idle if now - item[1] <= self.idle_timeout]
+            self._created -= len(expired)
+            self._cond.notify(len(expired))
+        return [ftp for ftp, _ in expired]
+
+    def acquire(self, timeout=None):
+        """Borrow a session, waiting up to ``timeout`` seconds for a free slot."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            ftp = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError('Pool de sessões FTP encerrado')
+                now = time.monotonic()
+                expired = self._evict_idle(now)
+                if self._idle:
+                    ftp, last_used = self._idle.pop()
+                elif self._created < self.size:
+                    self._created += 1
+                    create = True
+                elif not expired:
+                    remaining = None if deadline is None else deadline - now
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError('Nenhuma sessão FTP disponível')
+                    self._cond.wait(remaining)
+            for old in expired:
+                self._quit(old)
+            if ftp is not None:
+                if now - last_used < self.health_check_interval:
+                    return ftp
+                try:
+                    ftp.voidcmd('NOOP')
+                    return ftp
+                except all_errors:
+                    # A vaga continua reservada para a nova conexão
+                    logger.info('Sessão FTP inativa descartada, reconectando')
+                    self._quit(ftp)
+                    create = True
+            if create:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+
+    def release(self, ftp, broken=False):
+        """Return a borrowed session; broken sessions are closed."""
+        with self._cond:
+            if broken or self._closed:
+                self._created -= 1
+            else:
+                self._idle.append((ftp, time.monotonic()))
+            self._cond.notify()
+        if broken or self._closed:
+            self._quit(ftp)
+
+    @contextmanager
+    def session(self, timeout=None):
+        ftp = self.acquire(timeout)
+        try:
+            yield ftp
+        except BaseException:
+            self.release(ftp, broken=True)
+            raise
+        else:
+            self.release(ftp)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for ftp, _ in idle:
+            self._quit(ftp)
+
+
+_session_pool = None
+_session_pool_lock = threading.Lock()
+
+
+def get_session_pool():
+    """Return the shared session pool, rebuilding it when connections.ini changes."""
+    global _session_pool
+    with _session_pool_lock:
+        mtime = os.path.getmtime(FIRST_RUN_FILE) if os.path.exists(FIRST_RUN_FILE) else None
+        if _session_pool is None or _session_pool.config_mtime != mtime:
+            if _session_pool is not None:
+                _session_pool.close()
+            host, port, user, password, enc_enabled, enc_key = load_ftp_config()
+            pool_size, idle_timeout = load_pool_config()
+            _session_pool = FTPSessionPool(
+                host,
+                port,
+                user,
+                password,
+                size=pool_size,
+                idle_timeout=idle_timeout,
+                encryption_enabled=enc_enabled,
+                key=enc_key,
+            )
+            _session_pool.config_mtime = mtime
+        return _session_pool
+
+
+# Função para carregar a ordem de prioridade das transferências
+def load_transfer_config():
+    config = configparser.ConfigParser()
+    config.read(FIRST_RUN_FILE)
+    return config.get('FTP', 'transfer_order', fallback='smallest')
+
+
+class TransferCancelled(Exception):
+    """Raised inside a progress callback to abort a cancelled transfer."""
+
+
+class TransferQueue:
+    """Bounded scheduler that runs transfers over pooled FTP sessions.
+
+    Jobs are started by at most ``workers`` threads (by default the pool
+    size, so the server's per-IP connection limit is respected), ordered
+    smallest first, largest first or FIFO. Failed jobs are queued again up
+    to ``retries`` times on a fresh session, after an exponential
+    ``backoff``; resumable transfers then continue where they stopped. Progress is aggregated across
+    all jobs and :meth:`cancel` drops pending jobs and aborts running ones
+    at their next chunk.
+    """
+
+    ORDERS = ('smallest', 'largest', 'fifo')
+
+    def __init__(
+        self,
+        pool,
+        workers=None,
+        order='smallest',
+        progress_callback=None,
+        retries=0,
+        encryption_enabled=None,
+        key=None,
+        backoff=None,
+    ):
+        if order not in self.ORDERS:
+            raise ValueError(f'Ordem de transferência inválida: {order}')
+        self.pool = pool
+        self.workers = workers or pool.size
+        self.order = order
+        self.progress_callback = progress_callback
+        self.retries = retries
+        self.backoff = RETRY_BACKOFF if backoff is None else backoff
+        self.encryption_enabled = pool.encryption_enabled if encryption_enabled is None else encryption_enabled
+        self.key = pool.key if key is None else key
+        self.results = []
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.started_at = None
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._threads = []
+
+    def add(self, operation_func, *args, size=0, name=None):
+        """Queue ``operation_func(ftp, *args, ...)`` with an expected size."""
+        seq = next(self._seq)
+        if self.order == 'smallest':
+            priority = size
+        elif self.order == 'largest':
+            priority = -size
+        else:
+            priority = seq
+        job = {
+            'func': operation_func,
+            'args': args,
+            'size': size,
+            'name': name or str(args[0]),
+            'priority': priority,
+            'attempts': 0,
+            # Bytes informados pela última tentativa (descontados ao repetir)
+            'sent': 0,
+        }
+        with self._lock:
+            heapq.heappush(self._heap, (priority, seq, job))
+            self.bytes_total += size
+
+    @property
+    def pending(self):
+        return len(self._heap)
+
+    @property
+    def completed(self):
+        return len(self.results)
+
+    @property
+    def failed(self):
+        return [name for name, ok in self.results if not ok]
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def throughput(self):
+        """Aggregate transfer rate in bytes per second."""
+        if not self.started_at:
+            return 0.0
+        elapsed = time.perf_counter() - self.started_at
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for _ in range(min(self.workers, max(self.pending, 1))):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def wait(self):
+        for thread in self._threads:
+            thread.join()
+        return self.results
+
+    def run(self):
+        """Run every queued job and block until all of them finish."""
+        return self.start().wait()
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            dropped = [job for _, _, job in self._heap]
+            self._heap = []
+            self.results.extend((job['name'], False) for job in dropped)
+
+    def _next_job(self):
+        with self._lock:
+            if self._cancelled.is_set() or not self._heap:
+                return None
+            return heapq.heappop(self._heap)[2]
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            ok = self._run(job)
+            if not ok and job['attempts'] < self.retries and not self._cancelled.is_set():
+                job['attempts'] += 1
+                delay = min(self.backoff * 2 ** (job['attempts'] - 1), RETRY_BACKOFF_MAX)
+                logger.warning(
+                    'Repetindo transferência de %s em %.1fs (tentativa %d)',
+                    job['name'], delay, job['attempts'] + 1,
+                )
+                with self._lock:
+                    # A nova tentativa informa de novo o progresso (retomado ou do zero)
+                    self.bytes_done -= job['sent']
+                if not self._cancelled.wait(delay):
+                    with self._lock:
+                        heapq.heappush(self._heap, (job['priority'], next(self._seq), job))
+                    continue
+            with self._lock:
+                self.results.append((job['name'], ok))
+
+    def _run(self, job):
+        sent = 0
+        expected = job['size']
+
+        def progress(curr, total):
+            nonlocal sent, expected
+            if self._cancelled.is_set():
+                raise TransferCancelled(job['name'])
+            with self._lock:
+                if total and total != expected:
+                    # Tamanho real conhecido apenas durante a transferência
+                    self.bytes_total += total - expected
+                    expected = total
+                self.bytes_done += curr - sent
+                sent = curr
+            if self.progress_callback:
+                self.progress_callback(self.bytes_done, self.bytes_total)
+
+        ok = False
+        try:
+            ftp = self.pool.acquire()
+        except Exception as e:
+            logger.error('Erro ao obter sessão FTP para %s: %s', job['name'], e)
+            return False
+        try:
+            ok = bool(job['func'](
+                ftp,
+                *job['args'],
+                encryption_enabled=self.encryption_enabled,
+                key=self.key,
+                progress_callback=progress,
+            ))
+        except Exception as e:
+            logger.error('Erro durante transferência de %s: %s', job['name'], e)
+        finally:
+            self.pool.release(ftp, broken=not ok)
+        job['size'], job['sent'] = expected, sent
+        return ok
+
+
+class SingleSessionPool:
+    """Adapter that lets TransferQueue drive one already connected session."""
+
+    size = 1
+
+    def __init__(self, ftp, encryption_enabled=False, key=''):
+        self.ftp = ftp
+        self.encryption_enabled = encryption_enabled
+        self.key = key
+
+    def acquire(self, timeout=None):
+        return self.ftp
+
+    def release(self, ftp, broken=False):
+        pass
+
+
 def first_time_tutorial():
     """Display a simple GUI to create the connections.ini file."""
     tutorial = tk.Tk()
@@ -110,6 +508,17 @@ def show_wait_popup():
     return wait_popup
 
 
+# Função para consultar o tamanho de um arquivo remoto
+def remote_file_size(ftp, file_name):
+    """Return the size of ``file_name`` on the server, or None if unknown."""
+    try:
+        # O pyftpdlib recusa SIZE em modo ASCII
+        ftp.voidcmd('TYPE I')
+        return ftp.size(file_name)
+    except all_errors:
+        return None
+
+
 # Função para realizar upload de arquivo
 def upload_file(
     ftp,
@@ -118,38 +527,72 @@ def upload_file(
     encryption_enabled=False,
     key='',
     progress_callback=None,
+    resume=True,
 ):
+    """Upload ``file_path`` as ``file_name``.
+
+    Files of at least ``RESUME_MIN_SIZE`` bytes are sent to ``file_name +
+    '.part'`` and renamed when complete; a partial ``.part`` left by an
+    interrupted attempt is continued with ``REST`` + ``STOR`` and the
+    keystream positioned at the same offset. If the server refuses the
+    rename (e.g. no rename permission) the file is sent again straight to
+    ``file_name``.
+    """
     try:
         if not os.path.isfile(file_path):
-            logger.error(f"Caminho inválido para upload: {file_path}")
+            logger.error('Caminho inválido para upload: %s', file_path)
             return False
 
         start = time.perf_counter()
-        if encryption_enabled:
-            with open(file_path, 'rb') as file:
-                data = xor_cipher(file.read(), key)
-            ftp.storbinary(
-                f"STOR {file_name}",
-                io.BytesIO(data),
-                callback=(lambda d: progress_callback(len(d), len(data)) if progress_callback else None),
-            )
-        else:
-            total = os.path.getsize(file_path)
-            sent = 0
+        total = os.path.getsize(file_path)
+        resumable = resume and total >= RESUME_MIN_SIZE
+        target = file_name + PARTIAL_SUFFIX if resumable else file_name
+        offset = (remote_file_size(ftp, target) or 0) if resumable else 0
+        if offset > total:
+            offset = 0
+        if offset:
+            logger.info('Retomando upload de %s a partir do byte %s', file_name, offset)
+        sent = offset
 
-            def cb(data):
-                nonlocal sent
-                sent += len(data)
-                if progress_callback:
-                    progress_callback(sent, total)
+        def cb(data):
+            nonlocal sent
+            sent += len(data)
+            if progress_callback:
+                progress_callback(sent, total)
 
+        def send(target, offset):
             with open(file_path, 'rb') as file:
-                ftp.storbinary(f"STOR {file_name}", file, callback=cb)
+                file.seek(offset)
+                source = EncryptingReader(file, key, offset) if encryption_enabled else file
+                ftp.storbinary(f"STOR {target}", source, callback=cb, rest=offset or None)
+
+        try:
+            send(target, offset)
+            if resumable:
+                try:
+                    ftp.rename(target, file_name)
+                except error_perm as e:
+                    if 'exist' in str(e).lower() and remote_file_size(ftp, file_name) is not None:
+                        # Servidores Windows não sobrescrevem o destino no RNTO
+                        ftp.delete(file_name)
+                        ftp.rename(target, file_name)
+                    else:
+                        # Sem permissão de renomear basta o STOR direto no destino
+                        logger.warning('RNTO de %s recusado (%s), enviando direto ao destino', target, e)
+                        sent = 0
+                        send(file_name, 0)
+                        try:
+                            ftp.delete(target)
+                        except all_errors:
+                            pass
+        finally:
+            # A pasta mudou, mesmo que o envio tenha sido interrompido
+            remote_listing.invalidate_parent(ftp, file_name)
         elapsed = time.perf_counter() - start
-        logger.info(f"Upload do arquivo {file_name} concluído em {elapsed:.2f}s")
+        logger.info('Upload do arquivo %s concluído em %.2fs', file_name, elapsed)
         return True
     except Exception as e:
-        logger.error(f"Erro durante upload de arquivo: {str(e)}")
+        logger.error('Erro durante upload de arquivo: %s', e)
         return False
 
 
@@ -161,17 +604,33 @@ def download_file(
     encryption_enabled=False,
     key='',
     progress_callback=None,
+    remote_size=None,
+    resume=True,
 ):
+    """Download ``file_name`` into ``download_path``.
+
+    Data is written to a local ``.part`` file that is renamed when the
+    transfer ends; if one is left by an interrupted attempt the transfer
+    continues with ``REST`` + ``RETR`` from its size.
+    """
     try:
         if not os.path.isdir(download_path):
-            logger.error(f"Diretório de download inválido: {download_path}")
+            logger.error('Diretório de download inválido: %s', download_path)
             return False
         safe_name = os.path.basename(file_name)
         local_file_path = os.path.join(download_path, safe_name)
+        part_path = local_file_path + PARTIAL_SUFFIX
 
         start = time.perf_counter()
-        size = ftp.size(file_name) or 0
-        received = 0
+        # O tamanho já conhecido (ex.: fato MLSD) evita a ida e volta do SIZE
+        size = remote_size if remote_size is not None else remote_file_size(ftp, file_name) or 0
+        offset = os.path.getsize(part_path) if resume and os.path.exists(part_path) else 0
+        if not size or offset > size:
+            # Sem tamanho remoto não há como validar a parte já baixada
+            offset = 0
+        if offset:
+            logger.info('Retomando download de %s a partir do byte %s', file_name, offset)
+        received = offset
 
         def cb(data):
             nonlocal received
@@ -179,32 +638,286 @@ def download_file(
             if progress_callback:
                 progress_callback(received, size)
 
-        if encryption_enabled:
-            buffer = io.BytesIO()
-
+        cipher = XorCipher(key, offset) if encryption_enabled else None
+        with open(part_path, 'ab' if offset else 'wb') as file:
             def write_and_update(data):
                 cb(data)
-                buffer.write(data)
+                file.write(cipher.process(data) if cipher else data)
 
-            ftp.retrbinary(f"RETR {file_name}", write_and_update)
-            data = xor_cipher(buffer.getvalue(), key)
-            with open(local_file_path, 'wb') as file:
-                file.write(data)
-        else:
-            with open(local_file_path, 'wb') as file:
-                def write_and_update(data):
-                    cb(data)
-                    file.write(data)
-
-                ftp.retrbinary(f"RETR {file_name}", write_and_update)
+            if offset < size or not size:
+                ftp.retrbinary(f"RETR {file_name}", write_and_update, rest=offset or None)
+        os.replace(part_path, local_file_path)
         elapsed = time.perf_counter() - start
-        logger.info(f"Download do arquivo {file_name} concluído em {elapsed:.2f}s")
+        logger.info('Download do arquivo %s concluído em %.2fs', file_name, elapsed)
         return True
     except Exception as e:
-        logger.error(f"Erro durante download de arquivo: {str(e)}")
+        logger.error('Erro durante download de arquivo: %s', e)
         return False
 
 
+# Função para baixar uma faixa de bytes de um arquivo remoto
+def fetch_range(ftp, file_name, start, end, on_data, blocksize=SEGMENT_BLOCK_SIZE):
+    """Stream bytes ``[start, end)`` of ``file_name`` to ``on_data(pos, data)``.
+
+    The data connection is closed as soon as the range is complete and the
+    server's ``426`` reply for the cut transfer is consumed, so the session
+    stays usable. The reply is also read when the range fails.
+    """
+    ftp.voidcmd('TYPE I')
+    conn = ftp.transfercmd(f"RETR {file_name}", rest=start or None)
+    pos = start
+    try:
+        while pos < end:
+            data = conn.recv(min(blocksize, end - pos))
+            if not data:
+                break
+            on_data(pos, data)
+            pos += len(data)
+    except BaseException:
+        conn.close()
+        # Consome a resposta da transferência interrompida para a sessão voltar limpa
+        try:
+            ftp.voidresp()
+        except all_errors:
+            pass
+        raise
+    conn.close()
+    try:
+        ftp.voidresp()
+    except all_errors:
+        if pos < end:
+            raise
+    if pos < end:
+        raise EOFError(f'Faixa {start}-{end} de {file_name} incompleta')
+
+
+# Função para realizar download segmentado em várias conexões
+def download_file_segmented(
+    ftp,
+    file_name,
+    download_path,
+    encryption_enabled=False,
+    key='',
+    progress_callback=None,
+    remote_size=None,
+    pool=None,
+    segments=None,
+    retries=TRANSFER_RETRIES,
+):
+    """Download ``file_name`` over several pooled sessions in parallel.
+
+    The file is split in ranges of at least ``SEGMENT_MIN_SIZE`` bytes that
+    are fetched with ``REST`` offsets and written in place into a
+    preallocated ``.segpart`` file, which is removed if the download fails
+    so :func:`download_file` never resumes from it. Besides ``ftp`` only idle sessions of
+    ``pool`` are borrowed, never waited for; when none is free, or the file
+    is too small, this falls back to :func:`download_file`. A range that
+    fails is continued from where it stopped on another session.
+    """
+    size = remote_size if remote_size is not None else remote_file_size(ftp, file_name) or 0
+    wanted = min(segments or (pool.size if pool else 1), size // SEGMENT_MIN_SIZE)
+    sessions = [ftp]
+    while pool is not None and len(sessions) < wanted:
+        try:
+            extra = pool.acquire(timeout=0)
+        except Exception:
+            break
+        if extra in sessions:
+            break
+        sessions.append(extra)
+    if len(sessions) < 2:
+        return download_file(
+            ftp, file_name, download_path, encryption_enabled, key, progress_callback, remote_size=size
+        )
+
+    broken = set()
+    part_path = None
+    try:
+        if not os.path.isdir(download_path):
+            logger.error('Diretório de download inválido: %s', download_path)
+            return False
+        local_file_path = os.path.join(download_path, os.path.basename(file_name))
+        part_path = local_file_path + SEGMENTED_SUFFIX
+        start_time = time.perf_counter()
+
+        step = -(-size // len(sessions))
+        ranges = [[pos, min(pos + step, size), 0] for pos in range(0, size, step)]
+        lock = threading.Lock()
+        ready = threading.Condition(lock)
+        done = 0
+        in_flight = 0
+
+        with open(part_path, 'wb') as file:
+            file.truncate(size)
+            if hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(file.fileno(), 0, size)
+                except OSError:
+                    pass
+
+            def write_at(pos, data):
+                if hasattr(os, 'pwrite'):
+                    os.pwrite(file.fileno(), data, pos)
+                else:
+                    with lock:
+                        file.seek(pos)
+                        file.write(data)
+
+            def worker(session):
+                nonlocal done, in_flight
+                while True:
+                    with ready:
+                        # Faixas em andamento podem voltar à fila se a sessão falhar
+                        while not ranges and in_flight:
+                            ready.wait()
+                        if not ranges:
+                            return
+                        job = ranges.pop(0)
+                        in_flight += 1
+                    cipher = XorCipher(key, job[0]) if encryption_enabled else None
+
+                    def on_data(pos, data):
+                        nonlocal done
+                        write_at(pos, cipher.process(data) if cipher else data)
+                        with lock:
+                            job[0] = pos + len(data)
+                            done += len(data)
+                            # Chamado sob o lock para o total nunca retroceder
+                            if progress_callback:
+                                progress_callback(done, size)
+
+                    failed = False
+                    try:
+                        fetch_range(session, file_name, job[0], job[1], on_data)
+                    except Exception as e:
+                        logger.warning('Falha na faixa %s-%s de %s: %s', job[0], job[1], file_name, e)
+                        failed = True
+                        with lock:
+                            broken.add(session)
+                            if job[2] < retries and not isinstance(e, TransferCancelled):
+                                # A faixa continua do ponto em que parou em outra sessão
+                                job[2] += 1
+                                ranges.append(job)
+                    finally:
+                        with ready:
+                            in_flight -= 1
+                            ready.notify_all()
+                    if failed:
+                        return
+
+            threads = [threading.Thread(target=worker, args=(session,), daemon=True) for session in sessions]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        if ranges or done != size or os.path.getsize(part_path) != size:
+            logger.error('Download segmentado de %s incompleto: %s de %s bytes', file_name, done, size)
+            os.remove(part_path)
+            return False
+        os.replace(part_path, local_file_path)
+        elapsed = time.perf_counter() - start_time
+        logger.info(
+            'Download do arquivo %s concluído em %.2fs (%d conexões)', file_name, elapsed, len(sessions)
+        )
+        return True
+    except Exception as e:
+        logger.error('Erro durante download segmentado de arquivo: %s', e)
+        if part_path and os.path.exists(part_path):
+            os.remove(part_path)
+        return False
+    finally:
+        for session in sessions[1:]:
+            pool.release(session, broken=session in broken)
+
+
+# Função para criar no servidor apenas os diretórios que ainda não existem
+def ensure_remote_dirs(ftp, remote_dirs):
+    """Create the missing entries of ``remote_dirs`` (parents listed first).
+
+    Each existing parent is listed once with MLSD; children of directories
+    created in this pass are known to be missing and are created directly.
+    Returns False if any directory could not be created.
+    """
+    existing = {}
+    created = set()
+    ok = True
+    for path in remote_dirs:
+        parent, name = posixpath.split(path.rstrip('/'))
+        parent = parent or ('/' if path.startswith('/') else '.')
+        if parent in created:
+            missing = True
+        else:
+            if parent not in existing:
+                try:
+                    existing[parent] = {
+                        entry for entry, facts in ftp.mlsd(parent, facts=['type'])
+                        if facts.get('type') == 'dir'
+                    }
+                except all_errors:
+                    existing[parent] = set()
+            missing = name not in existing[parent]
+        if not missing:
+            continue
+        try:
+            ftp.mkd(path)
+            created.add(path)
+            remote_listing.invalidate(ftp, parent)
+        except all_errors as e:
+            logger.error('Erro ao criar diretório remoto %s: %s', path, e)
+            ok = False
+    return ok
+
+
+# Função para montar o manifesto de um upload de diretório
+def build_upload_manifest(dir_path, remote_dir='.'):
+    """Walk ``dir_path`` and return ``(remote_dirs, files)`` for an upload.
+
+    ``remote_dirs`` lists parents before children; ``files`` holds
+    ``(local_path, remote_path, size)`` tuples.
+    """
+    base = remote_dir.rstrip('/') or '/'
+    remote_dirs = [] if base in ('.', '/') else [base]
+    files = []
+    for root, _, names in os.walk(dir_path):
+        rel = os.path.relpath(root, dir_path)
+        target = base if rel == '.' else posixpath.join(base, rel.replace(os.sep, '/'))
+        if rel != '.':
+            remote_dirs.append(target)
+        for name in names:
+            local_file = os.path.join(root, name)
+            files.append((local_file, posixpath.join(target, name), os.path.getsize(local_file)))
+    return remote_dirs, files
+
+
+# Função para preparar o upload de diretório em uma fila de transferências
+def queue_directory_upload(
+    ftp,
+    dir_path,
+    remote_dir,
+    pool,
+    workers=None,
+    retries=TRANSFER_RETRIES,
+    **queue_kwargs,
+):
+    """Create the missing remote directories and return a TransferQueue
+    with one upload job per file, or None if ``dir_path`` is invalid.
+
+    The remote directories are created over ``ftp`` before any file is
+    queued, so the jobs can run in any order over ``pool``.
+    """
+    if not os.path.isdir(dir_path):
+        logger.error('Diretório inválido para upload: %s', dir_path)
+        return None
+    remote_dirs, files = build_upload_manifest(dir_path, remote_dir)
+    if not ensure_remote_dirs(ftp, remote_dirs):
+        logger.warning('Alguns diretórios remotos de %s não foram criados', remote_dir)
+    queue = TransferQueue(pool, workers=workers, order='fifo', retries=retries, **queue_kwargs)
+    for local_file, remote_file, size in files:
+        queue.add(upload_file, local_file, remote_file, size=size, name=remote_file)
+    return queue
+
+
 # Função para realizar upload de diretório
 def upload_directory(
     ftp,
@@ -213,38 +926,97 @@ def upload_directory(
     encryption_enabled=False,
     key='',
     progress_callback=None,
+    pool=None,
+    workers=None,
+    retries=TRANSFER_RETRIES,
 ):
+    """Upload a local tree, creating missing remote directories in one pass.
+
+    Files are sent over ``pool`` with up to ``workers`` parallel sessions
+    when a pool is given, otherwise sequentially over ``ftp``. Failed files
+    are retried ``retries`` times without stopping the other transfers.
+    """
     try:
-        if not os.path.isdir(dir_path):
-            logger.error(f"Diretório inválido para upload: {dir_path}")
+        queue = queue_directory_upload(
+            ftp,
+            dir_path,
+            remote_dir,
+            pool or SingleSessionPool(ftp),
+            workers=workers,
+            retries=retries,
+            progress_callback=progress_callback,
+            encryption_enabled=encryption_enabled,
+            key=key,
+        )
+        if queue is None:
             return False
-
-        for root, _, files in os.walk(dir_path):
-            rel = os.path.relpath(root, dir_path)
-            target = os.path.join(remote_dir, rel).replace('\\', '/') if rel != '.' else remote_dir.rstrip('/')
-            if rel != '.':
-                try:
-                    ftp.mkd(target)
-                except Exception:
-                    pass
-            for name in files:
-                local_file = os.path.join(root, name)
-                remote_file = os.path.join(target, name).replace('\\', '/')
-                if not upload_file(
-                    ftp,
-                    local_file,
-                    remote_file,
-                    encryption_enabled,
-                    key,
-                    progress_callback,
-                ):
-                    return False
-        return True
+        queue.run()
+        if queue.failed:
+            logger.error('Falha no upload de %s arquivo(s) da pasta %s', len(queue.failed), dir_path)
+        return not queue.failed
     except Exception as e:
-        logger.error(f"Erro durante upload de pasta: {str(e)}")
+        logger.error('Erro durante upload de pasta: %s', e)
         return False
 
 
+# Função para percorrer a árvore remota com MLSD
+def crawl_remote_tree(ftp, remote_dir, local_path):
+    """Walk ``remote_dir`` breadth-first with MLSD ``type,size,modify`` facts.
+
+    Returns ``(local_dirs, files)`` where ``files`` holds
+    ``(remote_path, local_dir, size, modify)`` tuples; ``size`` is None
+    when the server does not report it.
+    """
+    local_dirs = [local_path]
+    files = []
+    pending = [(remote_dir, local_path)]
+    while pending:
+        current, local_dir = pending.pop(0)
+        for name, facts in ftp.mlsd(current, facts=['type', 'size', 'modify']):
+            if name in {'.', '..'} or facts.get('type') in ('cdir', 'pdir'):
+                continue
+            remote_item = f"{current.rstrip('/')}/{name}"
+            if facts.get('type') == 'dir':
+                child = os.path.join(local_dir, name)
+                local_dirs.append(child)
+                pending.append((remote_item, child))
+            else:
+                size = facts.get('size')
+                files.append((remote_item, local_dir, int(size) if size else None, facts.get('modify')))
+    return local_dirs, files
+
+
+# Função para preparar o download de diretório em uma fila de transferências
+def queue_directory_download(
+    ftp,
+    remote_dir,
+    local_path,
+    pool,
+    workers=None,
+    retries=TRANSFER_RETRIES,
+    **queue_kwargs,
+):
+    """Crawl ``remote_dir`` over ``ftp``, create the local tree and return a
+    TransferQueue with one download job per remote file.
+
+    Sizes reported by MLSD seed the aggregate progress and are passed to
+    :func:`download_file`, which then skips its SIZE command.
+    """
+    local_dirs, files = crawl_remote_tree(ftp, remote_dir, local_path)
+    for local_dir in local_dirs:
+        os.makedirs(local_dir, exist_ok=True)
+    queue = TransferQueue(pool, workers=workers, order='fifo', retries=retries, **queue_kwargs)
+    for remote_file, local_dir, size, _ in files:
+        queue.add(
+            functools.partial(download_file, remote_size=size),
+            remote_file,
+            local_dir,
+            size=size or 0,
+            name=remote_file,
+        )
+    return queue
+
+
 # Função para realizar download de diretório
 def download_directory(
     ftp,
@@ -253,87 +1025,181 @@ def download_directory(
     encryption_enabled=False,
     key='',
     progress_callback=None,
+    pool=None,
+    workers=None,
+    retries=TRANSFER_RETRIES,
 ):
+    """Download a remote tree crawled once with MLSD.
+
+    Files are fetched over ``pool`` with up to ``workers`` parallel sessions
+    when a pool is given, otherwise sequentially over ``ftp``; progress is
+    aggregated over the whole tree.
+    """
     try:
-        os.makedirs(local_path, exist_ok=True)
-        for name, facts in ftp.mlsd(remote_dir, facts=['type']):
-            if name in {'.', '..'}:
-                continue
-            remote_item = f"{remote_dir.rstrip('/')}/{name}"
-            if facts.get('type') == 'dir':
-                download_directory(
-                    ftp,
-                    remote_item,
-                    os.path.join(local_path, name),
-                    encryption_enabled,
-                    key,
-                    progress_callback,
-                )
-            else:
-                download_file(
-                    ftp,
-                    remote_item,
-                    local_path,
-                    encryption_enabled,
-                    key,
-                    progress_callback,
-                )
-        return True
+        queue = queue_directory_download(
+            ftp,
+            remote_dir,
+            local_path,
+            pool or SingleSessionPool(ftp),
+            workers=workers,
+            retries=retries,
+            progress_callback=progress_callback,
+            encryption_enabled=encryption_enabled,
+            key=key,
+        )
+        queue.run()
+        if queue.failed:
+            logger.error('Falha no download de %s arquivo(s) da pasta %s', len(queue.failed), remote_dir)
+        return not queue.failed
     except Exception as e:
-        logger.error(f"Erro durante download de pasta: {str(e)}")
+        logger.error('Erro durante download de pasta: %s', e)
         return False
 
 
 # Função para listar arquivos do servidor FTP
-def list_files(ftp):
+def iter_remote_entries(ftp, path='.'):
+    """Yield ``(name, facts)`` for ``path`` as the MLSD reply arrives.
+
+    Servers without MLSD are listed with NLST and yield empty facts.
+    """
     try:
-        files = ftp.nlst()
-        logger.info(f"Arquivos no diretório do servidor FTP: {files}")
+        for name, facts in ftp.mlsd(path, facts=LISTING_FACTS):
+            if facts.get('type') not in ('cdir', 'pdir'):
+                yield name, facts
+    except error_perm:
+        for name in ftp.nlst(path):
+            yield posixpath.basename(name), {}
+
+
+class RemoteListing:
+    """Directory listings cached per (host, path) for ``ttl`` seconds.
+
+    Our own STOR/DELE/MKD call :meth:`invalidate` for the affected folder,
+    so the cache only goes stale on changes made by other clients. At most
+    ``max_dirs`` folders are kept, dropping the least recently used.
+    """
+
+    def __init__(self, ttl=LISTING_TTL, max_dirs=64, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_dirs = max_dirs
+        self.clock = clock
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(ftp, path):
+        return getattr(ftp, 'host', None), getattr(ftp, 'port', None), posixpath.normpath(path or '.')
+
+    def _cached(self, key):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or self.clock() - cached[0] > self.ttl:
+                return None
+            self._entries.move_to_end(key)
+            return cached[1]
+
+    def stream(self, ftp, path='.'):
+        """Yield entries lazily, caching the listing once it is complete."""
+        key = self._key(ftp, path)
+        cached = self._cached(key)
+        if cached is not None:
+            yield from cached
+            return
+        started = self.clock()
+        entries = []
+        for entry in iter_remote_entries(ftp, path):
+            entries.append(entry)
+            yield entry
+        with self._lock:
+            self._entries[key] = (started, entries)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_dirs:
+                self._entries.popitem(last=False)
+
+    def entries(self, ftp, path='.'):
+        return list(self.stream(ftp, path))
+
+    def page(self, ftp, path='.', page=0, page_size=LISTING_PAGE_SIZE):
+        """Return the entries of page ``page`` and the total number of entries."""
+        entries = self.entries(ftp, path)
+        return entries[page * page_size:(page + 1) * page_size], len(entries)
+
+    def invalidate(self, ftp, path='.'):
+        with self._lock:
+            self._entries.pop(self._key(ftp, path), None)
+
+    def invalidate_parent(self, ftp, path):
+        """Forget the listing of the folder that contains ``path``."""
+        self.invalidate(ftp, posixpath.dirname(path.rstrip('/')) or ('/' if path.startswith('/') else '.'))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+remote_listing = RemoteListing()
+
+
+def list_file_sizes(ftp, path='.'):
+    """Return ``{name: size}`` for the files in ``path`` (folders are left out).
+
+    Sizes come from the MLSD ``size`` fact and are None when the server
+    does not send it.
+    """
+    try:
+        files = {
+            name: int(facts['size']) if facts.get('size') else None
+            for name, facts in remote_listing.stream(ftp, path)
+            if facts.get('type', 'file') == 'file'
+        }
+        logger.info('%d arquivo(s) no diretório %s do servidor FTP', len(files), path)
         return files
     except Exception as e:
-        logger.error(f"Erro ao listar arquivos no servidor FTP: {str(e)}")
+        logger.error('Erro ao listar arquivos no servidor FTP: %s', e)
         return None
 
 
-# Funções de interface gráfica
-def perform_ftp_operation_with_progress(title, operation_func, *args):
-    progress_win = tk.Toplevel()
-    progress_win.title(title)
-    progress_win.geometry("300x100")
-    bar = ttk.Progressbar(progress_win, orient="horizontal", length=250, mode="determinate")
-    bar.pack(pady=20)
+def list_files(ftp, path='.'):
+    """Return the names of the files in ``path`` (folders are left out)."""
+    files = list_file_sizes(ftp, path)
+    return None if files is None else list(files)
 
-    def update(curr, total):
-        bar["maximum"] = total if total else 1
-        bar["value"] = curr
-        progress_win.update_idletasks()
 
-    try:
-        host, port, user, password, enc_enabled, enc_key = load_ftp_config()
-        ftp = FTP()
-        ftp.connect(host, port)
-        ftp.login(user, password)
+# Funções de interface gráfica
 
-        operation_result = operation_func(
-            ftp,
-            *args,
-            encryption_enabled=enc_enabled,
-            key=enc_key,
-            progress_callback=update,
+# Janela única de progresso para uma fila de transferências
+def run_transfer_queue_with_progress(title, queue):
+    progress_win = tk.Toplevel()
+    progress_win.title(title)
+    progress_win.geometry("320x150")
+    bar = ttk.Progressbar(progress_win, orient="horizontal", length=280, mode="determinate")
+    bar.pack(pady=15)
+    status = tk.Label(progress_win, text="Iniciando...")
+    status.pack()
+    ttk.Button(progress_win, text="Cancelar", command=queue.cancel).pack(pady=10)
+
+    total_jobs = queue.pending
+    queue.start()
+
+    def refresh():
+        bar["maximum"] = queue.bytes_total or 1
+        bar["value"] = queue.bytes_done
+        status["text"] = (
+            f"{queue.completed}/{total_jobs} arquivos - "
+            f"{queue.throughput / (1024 * 1024):.1f} MB/s"
         )
-        if operation_result:
-            messagebox.showinfo("Sucesso", "Operação realizada com sucesso")
-        else:
-            messagebox.showerror("Erro", "Erro durante a operação")
-    except Exception as e:
-        logger.error(f"Erro ao conectar ao servidor FTP: {str(e)}")
-        messagebox.showerror("Erro", f"Erro ao conectar ao servidor FTP: {str(e)}")
-    finally:
-        try:
-            ftp.quit()
-        except Exception:
-            pass
+        if queue.completed < total_jobs:
+            progress_win.after(200, refresh)
+            return
         progress_win.destroy()
+        if queue.cancelled:
+            messagebox.showwarning("Cancelado", "Transferências canceladas")
+        elif queue.failed:
+            messagebox.showerror("Erro", f"Falha em {len(queue.failed)} arquivo(s): {', '.join(queue.failed[:5])}")
+        else:
+            messagebox.showinfo("Sucesso", "Operação realizada com sucesso")
+
+    refresh()
 
 
 def upload():
@@ -341,40 +1207,75 @@ def upload():
     if not file_paths:
         return
 
+    try:
+        queue = TransferQueue(
+            get_session_pool(), order=load_transfer_config(), retries=TRANSFER_RETRIES
+        )
+    except Exception as e:
+        logger.error('Erro ao conectar ao servidor FTP: %s', e)
+        messagebox.showerror("Erro", f"Erro ao conectar ao servidor FTP: {str(e)}")
+        return
     for path in file_paths:
         name = os.path.basename(path)
-        threading.Thread(
-            target=perform_ftp_operation_with_progress,
-            args=(f"Upload {name}", upload_file, path, name),
-        ).start()
+        queue.add(upload_file, path, name, size=os.path.getsize(path), name=name)
+    run_transfer_queue_with_progress("Upload", queue)
 
 
 def download():
     try:
-        host, port, user, password, _, _ = load_ftp_config()
-        ftp = FTP()
-        ftp.connect(host, port)
-        ftp.login(user, password)
-
-        files = list_files(ftp)
+        with get_session_pool().session() as ftp:
+            sizes = list_file_sizes(ftp)
+        files = list(sizes or ())
         if not files:
             messagebox.showerror("Erro", "Não foi possível listar arquivos no servidor FTP")
             return
 
         download_window = tk.Toplevel()
-        download_window.geometry("300x250")
+        download_window.geometry("300x300")
         download_window.title("Selecionar Arquivos para Download")
 
         label = tk.Label(download_window, text="Selecione os arquivos para download:")
         label.pack(pady=10)
 
+        # Só a página atual vai para o Listbox; a seleção vale entre páginas
         listbox = tk.Listbox(download_window, selectmode=tk.MULTIPLE, width=40, height=8)
-        for f in files:
-            listbox.insert(tk.END, f)
         listbox.pack(pady=10)
+        pages = max(1, -(-len(files) // LISTING_PAGE_SIZE))
+        current = {'page': 0}
+        selected = set()
+
+        nav = tk.Frame(download_window)
+        nav.pack()
+        page_label = tk.Label(nav)
+
+        def remember_selection():
+            start = current['page'] * LISTING_PAGE_SIZE
+            for i in range(listbox.size()):
+                name = files[start + i]
+                if listbox.selection_includes(i):
+                    selected.add(name)
+                else:
+                    selected.discard(name)
+
+        def show_page(page):
+            remember_selection()
+            current['page'] = min(max(page, 0), pages - 1)
+            start = current['page'] * LISTING_PAGE_SIZE
+            listbox.delete(0, tk.END)
+            for i, name in enumerate(files[start:start + LISTING_PAGE_SIZE]):
+                listbox.insert(tk.END, name)
+                if name in selected:
+                    listbox.selection_set(i)
+            page_label.config(text=f"Página {current['page'] + 1}/{pages} ({len(files)} arquivos)")
+
+        tk.Button(nav, text="<", command=lambda: show_page(current['page'] - 1)).pack(side=tk.LEFT)
+        page_label.pack(side=tk.LEFT, padx=5)
+        tk.Button(nav, text=">", command=lambda: show_page(current['page'] + 1)).pack(side=tk.LEFT)
+        show_page(0)
 
         def start_download():
-            choices = [listbox.get(i) for i in listbox.curselection()]
+            remember_selection()
+            choices = [name for name in files if name in selected]
             if not choices:
                 messagebox.showerror("Erro", "Nenhum arquivo selecionado")
                 return
@@ -384,25 +1285,26 @@ def download():
                 return
 
             download_window.destroy()
+            pool = get_session_pool()
+            queue = TransferQueue(pool, order=load_transfer_config(), retries=TRANSFER_RETRIES)
+            # Arquivos grandes usam as sessões livres do pool em faixas paralelas
+            segmented = functools.partial(download_file_segmented, pool=pool)
             for choice in choices:
-                threading.Thread(
-                    target=perform_ftp_operation_with_progress,
-                    args=(f"Download {choice}", download_file, choice, download_path)
-                ).start()
+                # O tamanho do MLSD ordena a fila e dispensa o SIZE
+                size = sizes[choice]
+                queue.add(
+                    functools.partial(segmented, remote_size=size), choice, download_path,
+                    size=size or 0, name=choice,
+                )
+            run_transfer_queue_with_progress("Download", queue)
 
         btn_download = tk.Button(download_window, text="Download", command=start_download)
         btn_download.pack(pady=10)
 
     except Exception as e:
-        logger.error(f"Erro ao conectar ao servidor FTP: {str(e)}")
+        logger.error('Erro ao conectar ao servidor FTP: %s', e)
         messagebox.showerror("Erro", f"Erro ao conectar ao servidor FTP: {str(e)}")
 
-    finally:
-        try:
-            ftp.quit()
-        except:
-            pass
-
 
 # Funções de interface gráfica
 def main_tk():
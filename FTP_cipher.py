@@ -0,0 +1,92 @@
+"""Streaming XOR cipher shared by the FTP client and server."""
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # NumPy é opcional; sem ele usamos inteiros grandes
+    np = None
+
+# Tamanho máximo do bloco de chave pré-replicada mantido em memória
+KEYSTREAM_BLOCK_SIZE = 1024 * 1024
+
+
+class XorCipher:
+    """Stateful XOR keystream that encrypts or decrypts data in chunks.
+
+    The key offset is carried across calls to :meth:`process`, so feeding a
+    file in arbitrary pieces produces exactly the same output as ciphering
+    it in one go. Each chunk is XORed as a whole block, either through NumPy
+    (when installed) or through ``int.from_bytes`` over a pre-tiled key.
+    """
+
+    def __init__(self, key, position=0):
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        self.key = bytes(key)
+        self.position = position
+        self._tiled = b''
+
+    def seek(self, position):
+        """Move the keystream to an absolute byte position of the stream."""
+        self.position = position
+
+    def _keystream(self, phase, size):
+        # Garante que a chave replicada cubra a fase atual mais o bloco pedido
+        needed = phase + size
+        if len(self._tiled) < needed:
+            target = max(needed, min(len(self._tiled) * 2, KEYSTREAM_BLOCK_SIZE + len(self.key)))
+            repeat = -(-target // len(self.key))
+            self._tiled = self.key * repeat
+        return self._tiled[phase:needed]
+
+    def _xor_block(self, data, keystream):
+        if np is not None:
+            return np.bitwise_xor(
+                np.frombuffer(data, dtype=np.uint8),
+                np.frombuffer(keystream, dtype=np.uint8),
+            ).tobytes()
+        size = len(data)
+        value = int.from_bytes(data, 'little') ^ int.from_bytes(keystream, 'little')
+        return value.to_bytes(size, 'little')
+
+    def process(self, data):
+        """Return ``data`` XORed with the keystream and advance the offset."""
+        size = len(data)
+        if not self.key or not size:
+            self.position += size
+            return bytes(data)
+
+        key_len = len(self.key)
+        block = max(KEYSTREAM_BLOCK_SIZE - KEYSTREAM_BLOCK_SIZE % key_len, key_len)
+        view = memoryview(data)
+        parts = []
+        for start in range(0, size, block):
+            chunk = view[start:start + block]
+            phase = (self.position + start) % key_len
+            parts.append(self._xor_block(chunk, self._keystream(phase, len(chunk))))
+        self.position += size
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+
+def xor_cipher(data: bytes, key: str, position: int = 0) -> bytes:
+    """Encrypt or decrypt data using a simple XOR cipher."""
+    if not key:
+        return data
+    return XorCipher(key, position).process(data)
+
+
+class EncryptingReader:
+    """File-like wrapper that XORs every ``read()`` of the underlying file.
+
+    ``ftplib.FTP.storbinary`` only calls ``read(blocksize)``, so wrapping the
+    open file with this class streams ciphertext with O(blocksize) memory.
+    """
+
+    def __init__(self, file, key, position=0):
+        self.file = file
+        self.cipher = XorCipher(key, position)
+
+    def read(self, size=-1):
+        return self.cipher.process(self.file.read(size))
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,164 @@
+"""Non-blocking logging pipeline shared by the FTP server and client.
+
+Records are put on a bounded queue by the calling thread and formatted and
+written by a ``QueueListener`` thread, so the IOLoop never waits on disk I/O.
+"""
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# Atributos padrão do LogRecord; o restante vem de ``extra`` e vai para o JSON
+_RECORD_ATTRS = frozenset(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including ``extra`` fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created))
+            + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in ``rate`` records of each sampled event.
+
+    Only records logged with ``extra={'event': name}`` for an event listed in
+    ``rates`` are sampled; warnings and errors always pass.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {event: rate for event, rate in rates.items() if rate > 1}
+        self._counters = {event: itertools.count() for event in self.rates}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, 'event', None))
+        if rate is None:
+            return True
+        return next(self._counters[record.event]) % rate == 0
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and defers formatting to the listener.
+
+    Arguments are formatted on the listener thread, so pass values that are
+    not mutated after the call. Records that do not fit in the queue are
+    counted in ``dropped`` instead of blocking the caller.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def build_file_handler(filename, max_bytes=0, when='', backup_count=5, filemode='a'):
+    """Return a file handler rotating by size (``max_bytes``) or time (``when``)."""
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(
+            filename, when=when, backupCount=backup_count, encoding='utf-8'
+        )
+    if max_bytes:
+        return logging.handlers.RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+    return logging.FileHandler(filename, mode=filemode, encoding='utf-8')
+
+
+def setup_logging(
+    filename,
+    level=logging.INFO,
+    json_format=False,
+    max_bytes=0,
+    when='',
+    backup_count=5,
+    sample_rates=None,
+    console=True,
+    filemode='a',
+    queue_size=10000,
+):
+    """Route the root logger through a queue to file and console handlers.
+
+    Returns the started ``QueueListener``; it is stopped at exit, flushing
+    the records still queued. The listener is restarted in forked children
+    so ``multiprocess``/``prefork`` workers keep logging. Like
+    ``logging.basicConfig``, does nothing (returns None) when the root
+    logger already has handlers.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    handlers = [build_file_handler(filename, max_bytes, when, backup_count, filemode)]
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setLevel(level)
+        handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.queue_handler = queue_handler
+
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    listener.start()
+    atexit.register(stop_logging, listener)
+
+    def restart_in_child():
+        # A thread do listener não sobrevive ao fork
+        if listener._thread is None:
+            return
+        queue_handler.queue = listener.queue = queue.Queue(queue_size)
+        listener._thread = None
+        listener.start()
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=restart_in_child)
+    return listener
+
+
+def stop_logging(listener):
+    """Flush and stop ``listener``, reporting records dropped on overload."""
+    if listener._thread is None:
+        return
+    listener.stop()
+    dropped = listener.queue_handler.dropped
+    if dropped:
+        record = logging.LogRecord(
+            'FTP_logging', logging.WARNING, __file__, 0,
+            'Fila de log cheia: %d registros descartados', (dropped,), None,
+        )
+        for handler in listener.handlers:
+            handler.handle(record)
+    for handler in listener.handlers:
+        handler.flush()
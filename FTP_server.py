@@ -1,12 +1,957 @@
 import os
+import hashlib
+import hmac
 import logging
+import ipaddress
+import itertools
+import math
+import multiprocessing
+import signal
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser
+from functools import lru_cache, partial
 from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.exceptions import AuthenticationFailed
+from pyftpdlib.filesystems import AbstractedFS
 from pyftpdlib.handlers import FTPHandler, TLS_FTPHandler
-from pyftpdlib.servers import FTPServer
+from pyftpdlib.servers import FTPServer, ThreadedFTPServer
+
+try:
+    from pyftpdlib.servers import MultiprocessFTPServer
+except ImportError:  # disponível apenas em sistemas POSIX
+    MultiprocessFTPServer = None
+
+from FTP_cipher import XorCipher
+from FTP_logging import setup_logging
+from FTP_metrics import MetricsRegistry, start_metrics_server
 
 # Configuração de log
 logger = logging.getLogger(__name__)
+# Eventos por sessão/transferência que podem ser amostrados com LOG_SAMPLE_RATE
+SAMPLED_LOG_EVENTS = ('connection', 'transfer')
+
+
+class EncryptedFile:
+    """File wrapper that keeps data XOR-encrypted at rest.
+
+    Writes (STOR/APPE) are encrypted and reads (RETR) decrypted chunk by
+    chunk, with the keystream following the file position so REST offsets
+    and appends stay aligned. No ``fileno()`` is exposed, which makes
+    pyftpdlib fall back from sendfile() to the producer path.
+    """
+
+    def __init__(self, file, key):
+        self.file = file
+        self.name = file.name
+        self.cipher = XorCipher(key, file.tell())
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+    def read(self, size=-1):
+        return self.cipher.process(self.file.read(size))
+
+    def write(self, data):
+        return self.file.write(self.cipher.process(data))
+
+    def seek(self, offset, whence=0):
+        position = self.file.seek(offset, whence)
+        self.cipher.seek(position)
+        return position
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class EncryptedFS(AbstractedFS):
+    """AbstractedFS that keeps file contents XOR-encrypted with ``key``.
+
+    Files opened for STOR/APPE/RETR and the unique files created by STOU
+    (``mkstemp``) are wrapped in :class:`EncryptedFile`.
+    """
+
+    key = ''
+
+    def open(self, filename, mode):
+        return EncryptedFile(super().open(filename, mode), self.key)
+
+    def mkstemp(self, suffix='', prefix='', dir=None, mode='wb'):
+        return EncryptedFile(super().mkstemp(suffix, prefix, dir, mode), self.key)
+
+
+# Comandos que exigem verificação de caminho e de IP antes de executar
+GUARDED_COMMANDS = frozenset({
+    'STOR', 'RETR', 'APPE', 'MKD', 'XMKD', 'RMD', 'XRMD', 'DELE', 'RNFR', 'RNTO',
+})
+
+# Quantidade de caminhos verificados mantidos por sessão
+PATH_CACHE_SIZE = 4096
+
+
+class LRUCache:
+    """Small bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self.data.pop(key, default)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def prune(self, predicate):
+        """Remove the entries for which ``predicate(key, value)`` is true."""
+        with self.lock:
+            for key in [key for key, value in self.data.items() if predicate(key, value)]:
+                del self.data[key]
+
+    def __len__(self):
+        return len(self.data)
+
+
+class DirectoryListingCache:
+    """Directory entries, their ``lstat`` results and rendered listings.
+
+    Shared by all sessions of a process. A cached directory is reused while
+    its mtime is unchanged and it is younger than ``ttl`` seconds (changes
+    to file contents do not touch the directory mtime). Each directory also
+    keeps up to ``max_variants`` rendered outputs (LIST, or MLSD for a given
+    set of permissions and facts) when it has at most ``max_rendered``
+    entries; larger listings are streamed as usual. The estimated memory use
+    is kept under ``max_bytes`` by evicting the least recently used
+    directories.
+    """
+
+    # Custo estimado de um nome com seu os.stat_result em memória
+    ENTRY_BYTES = 256
+    # Linhas por bloco entregue ao produtor do canal de dados
+    CHUNK_LINES = 1000
+    # Acima disso a saída não é montada em memória (~100 bytes por linha)
+    MAX_RENDERED = 20000
+
+    def __init__(
+        self, max_bytes=64 * 1024 * 1024, ttl=10.0, max_variants=4, max_rendered=MAX_RENDERED, clock=time.monotonic
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_variants = max_variants
+        self.max_rendered = max_rendered
+        self.clock = clock
+        # caminho -> [mtime_ns, criado_em, nomes, stats, variantes, bytes]
+        self.dirs = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _evict(self, keep=None):
+        for path in list(self.dirs):
+            if self.size <= self.max_bytes:
+                return
+            if path != keep:
+                self.size -= self.dirs.pop(path)[5]
+
+    def listing(self, path):
+        """Return ``(names, stats, hit)`` for directory ``path``."""
+        mtime = os.stat(path).st_mtime_ns
+        with self.lock:
+            cached = self.dirs.get(path)
+            if cached is not None and cached[0] == mtime and self.clock() - cached[1] <= self.ttl:
+                self.dirs.move_to_end(path)
+                self.hits += 1
+                return cached[2], cached[3], True
+            self.misses += 1
+        created = self.clock()
+        names = os.listdir(path)
+        stats = {}
+        for name in names:
+            try:
+                stats[name] = os.lstat(os.path.join(path, name))
+            except OSError:
+                continue
+        weight = len(names) * self.ENTRY_BYTES
+        if weight <= self.max_bytes:
+            with self.lock:
+                previous = self.dirs.pop(path, None)
+                if previous is not None:
+                    self.size -= previous[5]
+                self.dirs[path] = [mtime, created, names, stats, OrderedDict(), weight]
+                self.size += weight
+                self._evict(keep=path)
+        return names, stats, False
+
+    def rendered(self, path, names, variant, render):
+        """Return ``render()`` joined in chunks, cached with listing ``names``.
+
+        ``names`` must be the list returned by :meth:`listing`; if the
+        directory was refreshed in the meantime the output is not cached.
+        Listings of more than ``max_rendered`` entries are not cached and
+        ``render()`` is returned unconsumed.
+        """
+        if len(names) > self.max_rendered:
+            return render()
+        with self.lock:
+            cached = self.dirs.get(path)
+            if cached is not None and cached[2] is names and variant in cached[4]:
+                return cached[4][variant]
+        lines = iter(render())
+        chunks = []
+        while True:
+            chunk = b''.join(itertools.islice(lines, self.CHUNK_LINES))
+            if not chunk:
+                break
+            chunks.append(chunk)
+        weight = sum(len(chunk) for chunk in chunks)
+        with self.lock:
+            cached = self.dirs.get(path)
+            if cached is None or cached[2] is not names or variant in cached[4]:
+                return chunks
+            variants = cached[4]
+            if len(variants) >= self.max_variants:
+                dropped = sum(len(chunk) for chunk in variants.popitem(last=False)[1])
+                cached[5] -= dropped
+                self.size -= dropped
+            variants[variant] = chunks
+            cached[5] += weight
+            self.size += weight
+            self._evict(keep=path)
+            if self.size > self.max_bytes:
+                # Não coube nem sozinho: mantém só a listagem
+                del variants[variant]
+                cached[5] -= weight
+                self.size -= weight
+        return chunks
+
+    def invalidate(self, path):
+        with self.lock:
+            cached = self.dirs.pop(path, None)
+            if cached is not None:
+                self.size -= cached[5]
+
+    def invalidate_parent(self, path):
+        """Forget the directory that contains ``path``."""
+        self.invalidate(os.path.dirname(path))
+
+    def clear(self):
+        with self.lock:
+            self.dirs.clear()
+            self.size = 0
+
+
+class CachedFS(AbstractedFS):
+    """Serve directory listings from the ``cache`` DirectoryListingCache.
+
+    ``listdir`` comes from the cache, and LIST/MLSD output of the full
+    directory it returned is rendered once per variant (large directories
+    are streamed, see ``DirectoryListingCache.max_rendered``). The cached
+    ``lstat`` results are only used while rendering that output; any other
+    ``lstat``/``stat`` (MLST, SIZE, ...) goes to the disk. ``lookups`` is an
+    optional counter labelled with ``hit``/``miss``.
+    """
+
+    cache = None
+    lookups = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Última listagem devolvida por listdir, até ser formatada
+        self._listing = None
+        # Listagem em renderização: só então os stats do cache valem
+        self._rendering = None
+
+    def listdir(self, path):
+        names, stats, hit = self.cache.listing(path)
+        if self.lookups is not None:
+            self.lookups.labels('hit' if hit else 'miss').inc()
+        # pyftpdlib ordena a lista recebida; o cache guarda a original
+        listing = list(names)
+        self._listing = (path, names, stats, listing)
+        return listing
+
+    def forget_listing(self):
+        """Drop the listing kept for the next LIST/MLSD of this session."""
+        self._listing = None
+
+    def _cached_stat(self, path):
+        if self._rendering is None:
+            return None
+        basedir, name = os.path.split(path)
+        if basedir != self._rendering[0]:
+            return None
+        return self._rendering[2].get(name)
+
+    def lstat(self, path):
+        st = self._cached_stat(path)
+        return st if st is not None else super().lstat(path)
+
+    def stat(self, path):
+        st = self._cached_stat(path)
+        # Links simbólicos precisam do stat do destino (fato unique do MLSD)
+        if st is None or (st.st_mode & 0o170000) == 0o120000:
+            return super().stat(path)
+        return st
+
+    def _render(self, basedir, listing, variant, render):
+        current, self._listing = self._listing, None
+        # Só a listagem completa devolvida por listdir é reaproveitada
+        if current is None or current[0] != basedir or current[3] is not listing:
+            return render()
+        # rendered() consome render() antes de retornar, exceto em listagens
+        # grandes, que seguem sob demanda com o stat do disco
+        self._rendering = current
+        try:
+            return iter(self.cache.rendered(basedir, current[1], variant, render))
+        finally:
+            self._rendering = None
+
+    def format_list(self, basedir, listing, ignore_err=True):
+        render = partial(super().format_list, basedir, listing, ignore_err)
+        return self._render(basedir, listing, ('LIST', self.cmd_channel.use_gmt_times), render)
+
+    def format_mlsx(self, basedir, listing, perms, facts, ignore_err=True):
+        render = partial(super().format_mlsx, basedir, listing, perms, facts, ignore_err)
+        variant = ('MLSD', perms, tuple(facts), self.cmd_channel.use_gmt_times)
+        return self._render(basedir, listing, variant, render)
+
+
+class PathJail:
+    """Confine filesystem paths to a root directory.
+
+    The canonical root is computed once. Candidates are resolved with
+    ``os.path.realpath`` semantics, so symlinks cannot escape the jail and
+    sibling prefixes such as ``/tmp2`` are not mistaken for ``/tmp``. The
+    resolved parent directory is cached, leaving a single ``lstat`` of the
+    last component per check. :meth:`forget` must be called when a
+    directory is removed or renamed; it also bumps ``generation`` so
+    callers caching verdicts know to drop them.
+    """
+
+    def __init__(self, root, cache_size=65536):
+        self.root = os.path.realpath(root)
+        self.prefix = self.root if self.root.endswith(os.sep) else self.root + os.sep
+        self._dirs = LRUCache(cache_size)
+        self.generation = 0
+
+    def resolve(self, path):
+        """Return the real path of ``path`` using the directory cache."""
+        directory, name = os.path.split(os.path.abspath(path))
+        real_dir = self._dirs.get(directory)
+        if real_dir is None:
+            real_dir = os.path.realpath(directory)
+            self._dirs[directory] = real_dir
+        real = os.path.join(real_dir, name)
+        if os.path.islink(real):
+            real = os.path.realpath(real)
+        return real
+
+    def contains(self, path):
+        real = self.resolve(path)
+        return real == self.root or real.startswith(self.prefix)
+
+    def forget(self, path):
+        """Drop cached directories at or below ``path``, by name or real path."""
+        path = os.path.abspath(path)
+        real = self.resolve(path)
+
+        def below(candidate, base):
+            return candidate == base or candidate.startswith(base.rstrip(os.sep) + os.sep)
+
+        self._dirs.prune(lambda directory, real_dir: below(directory, path) or below(real_dir, real))
+        self.generation += 1
+
+
+# Parâmetros do hash de senha (PBKDF2-SHA256 com salt aleatório)
+PBKDF2_ITERATIONS = 200000
+
+
+def hash_password(password, salt=None, iterations=PBKDF2_ITERATIONS):
+    """Return ``password`` hashed as ``pbkdf2_sha256$iterations$salt$hash``."""
+    salt = salt or os.urandom(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f'pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}'
+
+
+def verify_password(password, encoded):
+    try:
+        algorithm, iterations, salt, expected = encoded.split('$')
+    except ValueError:
+        return False
+    if algorithm != 'pbkdf2_sha256':
+        return False
+    digest = hashlib.pbkdf2_hmac(
+        'sha256', password.encode('utf-8'), bytes.fromhex(salt), int(iterations)
+    )
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+class UserStore:
+    """SQLite account table indexed by username with salted password hashes.
+
+    Connections are opened per thread (and reopened after a fork), so the
+    store can be shared by every server mode.
+    """
+
+    def __init__(self, path, iterations=PBKDF2_ITERATIONS):
+        self.path = path
+        self.iterations = iterations
+        self._local = threading.local()
+        self._pid = os.getpid()
+        with self.connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS users ('
+                'username TEXT PRIMARY KEY, password_hash TEXT NOT NULL, '
+                'home TEXT NOT NULL, perm TEXT NOT NULL, '
+                'msg_login TEXT NOT NULL, msg_quit TEXT NOT NULL)'
+            )
+
+    def connection(self):
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def add_users(self, users):
+        """Insert or replace ``(username, password, home, perm)`` tuples."""
+        rows = (
+            (name, hash_password(password, iterations=self.iterations), home, perm,
+             'Login successful.', 'Goodbye.')
+            for name, password, home, perm in users
+        )
+        with self.connection() as conn:
+            conn.executemany('INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def add_user(self, username, password, home, perm='elr'):
+        self.add_users([(username, password, home, perm)])
+
+    def remove_user(self, username):
+        with self.connection() as conn:
+            conn.execute('DELETE FROM users WHERE username = ?', (username,))
+
+    def get_user(self, username):
+        row = self.connection().execute(
+            'SELECT * FROM users WHERE username = ?', (username,)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+
+class SQLiteAuthorizer:
+    """pyftpdlib authorizer backed by a :class:`UserStore`.
+
+    Only recently used accounts are kept in memory: user records and
+    validated credentials live in bounded LRU caches with a TTL, so logins
+    and the per-command permission checks stay cheap without loading the
+    whole user table. ``reload()`` drops the caches after the database
+    changes.
+    """
+
+    def __init__(self, store, cache_size=10000, ttl=300):
+        self.store = store
+        self.ttl = ttl
+        self._users = LRUCache(cache_size)
+        self._credentials = LRUCache(cache_size)
+        # Segredo do processo: o cache guarda apenas um HMAC da senha
+        self._secret = os.urandom(32)
+
+    def reload(self):
+        self._users.clear()
+        self._credentials.clear()
+        logger.info('Cache de usuários recarregado')
+
+    def _user(self, username):
+        cached = self._users.get(username)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        user = self.store.get_user(username)
+        if user is not None:
+            self._users[username] = (user, time.monotonic() + self.ttl)
+        return user
+
+    def _credential_digest(self, username, password):
+        message = f'{username}\0{password}'.encode('utf-8')
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    def check_cached_credentials(self, username, password):
+        cached = self._credentials.get(username)
+        if cached is None or cached[1] <= time.monotonic():
+            return False
+        return hmac.compare_digest(cached[0], self._credential_digest(username, password))
+
+    def verify_credentials(self, username, password):
+        """Run the password KDF and remember the result when it succeeds."""
+        user = self._user(username)
+        if user is None or not verify_password(password, user['password_hash']):
+            return False
+        digest = self._credential_digest(username, password)
+        self._credentials[username] = (digest, time.monotonic() + self.ttl)
+        return True
+
+    def validate_authentication(self, username, password, handler):
+        if self.check_cached_credentials(username, password):
+            return
+        if not self.verify_credentials(username, password):
+            raise AuthenticationFailed('Authentication failed.')
+
+    def has_user(self, username):
+        return self._user(username) is not None
+
+    def get_home_dir(self, username):
+        return self._user(username)['home']
+
+    def get_perms(self, username):
+        user = self._user(username)
+        return user['perm'] if user else ''
+
+    def has_perm(self, username, perm, path=None):
+        return perm in self.get_perms(username)
+
+    def get_msg_login(self, username):
+        return self._user(username)['msg_login']
+
+    def get_msg_quit(self, username):
+        user = self._user(username)
+        return user['msg_quit'] if user else 'Goodbye.'
+
+    def impersonate_user(self, username, password):
+        pass
+
+    def terminate_impersonation(self, username):
+        pass
+
+
+class AuthWorkerPool:
+    """Bounded thread pool that runs password verification off the IOLoop.
+
+    The executor is created lazily in each process, so it also works with
+    workers forked after start-up. ``submit`` returns None when too many
+    verifications are already queued.
+    """
+
+    def __init__(self, workers, max_pending=None):
+        self.workers = workers
+        self.max_pending = max_pending or workers * 16
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def submit(self, func, *args):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='ftp-auth')
+                self._pid = os.getpid()
+                self.pending = 0
+            if self.pending >= self.max_pending:
+                return None
+            self.pending += 1
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+
+
+class LoopWakeup:
+    """Run ``callback`` on the IOLoop thread once ``future`` is done.
+
+    The future's done-callback, called on the worker thread, writes one byte
+    to a socketpair registered with ``ioloop``; the loop wakes up, runs
+    ``callback`` and drops the socketpair. Nothing is polled in between.
+    Create it on the loop thread; errors raised by ``callback`` go to
+    ``errback``.
+    """
+
+    def __init__(self, ioloop, future, callback, errback=None):
+        self.ioloop = ioloop
+        self.callback = callback
+        self.errback = errback
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+        self._writer.setblocking(False)
+        self._fileno = self._reader.fileno()
+        ioloop.register(self._fileno, self, ioloop.READ)
+        future.add_done_callback(self._wake)
+
+    def _wake(self, future):
+        try:
+            self._writer.send(b'\0')
+        except OSError:
+            # Já fechado (conexão encerrada ou servidor parando)
+            pass
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def handle_read_event(self):
+        self.close()
+        self.callback()
+
+    def handle_close(self):
+        self.close()
+
+    def handle_error(self):
+        self.close()
+        if self.errback is not None:
+            self.errback()
+        else:
+            logger.exception('Erro no retorno de uma tarefa em segundo plano')
+
+    def close(self):
+        if self._reader is None:
+            return
+        self.ioloop.unregister(self._fileno)
+        self._reader.close()
+        self._writer.close()
+        self._reader = None
+
+
+class LoginThrottle:
+    """Exponential backoff per remote IP and per username after failed logins.
+
+    The per-username backoff only applies to IPs that have failed logins of
+    their own, so a distributed guessing attack is slowed down while a
+    correct password from a clean IP is never refused. A successful login
+    clears the IP's record, not the username's.
+    """
+
+    def __init__(self, base_delay=1.0, max_delay=300.0, cache_size=100000):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._failures = LRUCache(cache_size)
+
+    def retry_after(self, ip, username):
+        """Return how many seconds the next attempt must still wait."""
+        ip_entry = self._failures.get(('ip', ip))
+        if ip_entry is None:
+            return 0.0
+        now = time.monotonic()
+        user_entry = self._failures.get(('user', username))
+        user_wait = user_entry[1] - now if user_entry is not None else 0.0
+        return max(ip_entry[1] - now, user_wait, 0.0)
+
+    def failed(self, ip, username):
+        now = time.monotonic()
+        for key in (('ip', ip), ('user', username)):
+            count = self._failures.get(key, (0, 0))[0] + 1
+            delay = min(self.base_delay * 2 ** (count - 1), self.max_delay)
+            self._failures[key] = (count, now + delay)
+
+    def succeeded(self, ip, username):
+        self._failures.pop(('ip', ip))
+
+
+class IPAccessList:
+    """IP access list compiled once from single addresses and CIDR ranges.
+
+    Exact addresses live in a frozenset and networks in one hash table per
+    (IP version, prefix length), so a lookup costs at most one set probe per
+    distinct prefix length instead of a scan over every entry. Verdicts are
+    cached per remote IP.
+    """
+
+    def __init__(self, entries, cache_size=65536):
+        addresses = set()
+        networks = {4: {}, 6: {}}
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+            try:
+                network = ipaddress.ip_network(entry, strict=False)
+            except ValueError:
+                logger.warning(f'Entrada de IP inválida ignorada: {entry}')
+                continue
+            if network.num_addresses == 1:
+                addresses.add(str(network.network_address))
+                continue
+            shift = network.max_prefixlen - network.prefixlen
+            table = networks[network.version].setdefault(network.prefixlen, set())
+            table.add(int(network.network_address) >> shift)
+        self.addresses = frozenset(addresses)
+        self.networks = {
+            version: sorted(
+                (prefixlen, frozenset(table)) for prefixlen, table in tables.items()
+            )
+            for version, tables in networks.items()
+        }
+        self.contains = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def __contains__(self, ip):
+        return self.contains(ip)
+
+    def _lookup(self, ip):
+        if ip in self.addresses:
+            return True
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        if str(address) in self.addresses:
+            return True
+        value = int(address)
+        for prefixlen, table in self.networks[address.version]:
+            if value >> (address.max_prefixlen - prefixlen) in table:
+                return True
+        return False
+
+
+class SharedConnectionLimiter:
+    """Connection counters shared by every worker of the server.
+
+    In prefork mode each worker runs its own pyftpdlib server, so the
+    MAX_CONNECTIONS/MAX_CONNECTIONS_PER_IP limits are checked here against
+    counters living in a ``multiprocessing.Manager`` dict created before
+    the fork. With the default arguments it works with local state only.
+    """
+
+    TOTAL = '__total__'
+
+    def __init__(self, max_cons, max_cons_per_ip, counts=None, lock=None):
+        self.max_cons = max_cons
+        self.max_cons_per_ip = max_cons_per_ip
+        self.counts = counts if counts is not None else {}
+        self.lock = lock or threading.Lock()
+
+    def acquire(self, ip):
+        """Reserve a slot for ``ip``; return the 421 reason when refused."""
+        with self.lock:
+            total = self.counts.get(self.TOTAL, 0)
+            per_ip = self.counts.get(ip, 0)
+            if self.max_cons and total >= self.max_cons:
+                return 'Too many connections. Service temporarily unavailable.'
+            if self.max_cons_per_ip and per_ip >= self.max_cons_per_ip:
+                return 'Too many connections from the same IP address.'
+            self.counts[self.TOTAL] = total + 1
+            self.counts[ip] = per_ip + 1
+        return None
+
+    def release(self, ip):
+        with self.lock:
+            self.counts[self.TOTAL] = max(self.counts.get(self.TOTAL, 0) - 1, 0)
+            per_ip = self.counts.get(ip, 0) - 1
+            if per_ip > 0:
+                self.counts[ip] = per_ip
+            else:
+                self.counts.pop(ip, None)
+
+
+BYTE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_byte_rate(text):
+    """Parse a bytes-per-second value such as ``512K`` or ``10M`` (0 = unlimited)."""
+    text = str(text).strip().upper()
+    if not text:
+        return 0
+    if text[-1] in BYTE_UNITS:
+        return int(float(text[:-1]) * BYTE_UNITS[text[-1]])
+    return int(text)
+
+
+def parse_user_bandwidth(text):
+    """Parse ``user:read:write`` entries separated by commas."""
+    limits = {}
+    for entry in text.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            username, read, write = entry.rsplit(':', 2)
+            limits[username.strip()] = (parse_byte_rate(read), parse_byte_rate(write))
+        except ValueError:
+            logger.warning(f'Limite de banda inválido ignorado: {entry}')
+    return limits
+
+
+class TokenBucket:
+    """Token bucket letting ``rate`` bytes per second through.
+
+    Consumption may run ahead of the bucket; the returned delay is how long
+    the caller must pause for the debt to be paid back. A rate of 0 means
+    unlimited.
+    """
+
+    def __init__(self, rate, clock=time.monotonic):
+        self.rate = rate
+        self.clock = clock
+        self.tokens = rate
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate
+            self.tokens = min(self.tokens, rate)
+
+    def consume(self, amount):
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            # Acumula no máximo um segundo de tokens
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class BandwidthScheduler:
+    """Token buckets shared by the data channels of one server process.
+
+    Every transfer is charged to the bucket of its user and of its client IP
+    (``read`` is data received by the server, ``write`` data sent). A global
+    cap is split in equal shares among the channels active in the same
+    direction, so one bulk transfer cannot starve the others. Buckets of
+    users and IPs without active channels are dropped.
+    """
+
+    DIRECTIONS = ('read', 'write')
+
+    def __init__(self, user_limits=(0, 0), user_overrides=None, ip_limits=(0, 0), global_limits=(0, 0),
+                 clock=time.monotonic):
+        self.user_limits = user_limits
+        self.user_overrides = user_overrides or {}
+        self.ip_limits = ip_limits
+        self.global_limits = global_limits
+        self.clock = clock
+        self._buckets = {}
+        self._refs = {}
+        self._channels = {}
+        self._shares = {direction: {} for direction in self.DIRECTIONS}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return any(self.user_limits + self.ip_limits + self.global_limits) or any(
+            any(limits) for limits in self.user_overrides.values()
+        )
+
+    def rates(self, username, ip, direction):
+        """Return the (user, IP, global) rates that apply to a channel."""
+        index = self.DIRECTIONS.index(direction)
+        user = self.user_overrides.get(username, self.user_limits)[index]
+        return user, self.ip_limits[index], self.global_limits[index]
+
+    def limited(self, username, ip):
+        return any(any(self.rates(username, ip, direction)) for direction in self.DIRECTIONS)
+
+    def register(self, channel, username, ip, direction):
+        """Attach ``channel`` to its buckets for one transfer direction."""
+        user_rate, ip_rate, global_rate = self.rates(username, ip, direction)
+        with self._lock:
+            keys = []
+            for key, rate in ((('user', username, direction), user_rate), (('ip', ip, direction), ip_rate)):
+                if rate:
+                    if key not in self._buckets:
+                        self._buckets[key] = TokenBucket(rate, self.clock)
+                    self._refs[key] = self._refs.get(key, 0) + 1
+                    keys.append(key)
+            buckets = [self._buckets[key] for key in keys]
+            if global_rate:
+                share = TokenBucket(global_rate, self.clock)
+                self._shares[direction][channel] = share
+                self._rebalance(direction)
+                buckets.append(share)
+            self._channels[channel] = (keys, direction)
+        return buckets
+
+    def unregister(self, channel):
+        with self._lock:
+            keys, direction = self._channels.pop(channel, ((), None))
+            for key in keys:
+                self._refs[key] -= 1
+                if not self._refs[key]:
+                    del self._refs[key]
+                    del self._buckets[key]
+            if direction and self._shares[direction].pop(channel, None) is not None:
+                self._rebalance(direction)
+
+    def _rebalance(self, direction):
+        shares = self._shares[direction]
+        if shares:
+            rate = max(self.global_limits[self.DIRECTIONS.index(direction)] // len(shares), 1)
+            for bucket in shares.values():
+                bucket.set_rate(rate)
+
+    @staticmethod
+    def consume(buckets, amount):
+        """Charge ``amount`` bytes to ``buckets`` and return the pause needed."""
+        return max((bucket.consume(amount) for bucket in buckets), default=0.0)
+
+
+class ServerMetrics:
+    """Metrics fed by the handler hooks and served by ``start_metrics_server``."""
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.sessions_active = r.gauge('ftp_sessions_active', 'Sessões FTP abertas')
+        self.connections = r.counter('ftp_connections_total', 'Conexões FTP aceitas')
+        self.logins = r.counter('ftp_logins_total', 'Tentativas de login por resultado', ['result'])
+        self.rejections = r.counter(
+            'ftp_rejections_total', 'Operações recusadas por listas de IP, caminho ou limites', ['reason']
+        )
+        self.commands = r.histogram(
+            'ftp_command_duration_seconds', 'Tempo de processamento dos comandos no IOLoop', ['command']
+        )
+        self.dir_cache = r.counter(
+            'ftp_dir_cache_lookups_total', 'Consultas ao cache de listagens por resultado', ['result']
+        )
+        self.transfer_bytes = r.counter(
+            'ftp_transfer_bytes_total', 'Bytes do canal de dados (in = recebidos, out = enviados)', ['direction']
+        )
+        self.transfers = r.counter('ftp_transfers_total', 'Transferências de arquivo', ['direction', 'result'])
+        self.throughput = r.histogram(
+            'ftp_transfer_throughput_bytes_per_second',
+            'Vazão das transferências de arquivo concluídas',
+            ['direction'],
+            buckets=tuple(2 ** n * 65536 for n in range(0, 15, 2)),
+        )
 
 
 def create_config_interactively():
@@ -46,6 +991,8 @@ def create_config_interactively():
         "LOG_LEVEL": log_level,
         "ENCRYPTION_ENABLED": str(encryption_enabled),
         "ENCRYPTION_KEY": enc_key,
+        "SERVER_MODE": "async",
+        "SERVER_WORKERS": "0",
     }
 
     config["USERS"] = {
@@ -57,6 +1004,15 @@ def create_config_interactively():
         "FTP_PERM_DEFAULT": "elr",
     }
 
+    config["USERS"].update({
+        "USER_DB": "",
+        "AUTH_CACHE_SIZE": "10000",
+        "AUTH_CACHE_TTL": "300",
+        "AUTH_WORKERS": "4",
+        "LOGIN_BACKOFF_BASE": "1",
+        "LOGIN_BACKOFF_MAX": "300",
+    })
+
     config["PATH"] = {"ALLOWED_PATH": allowed_path}
     config["IP"] = {
         "IP_WHITELIST": ip_whitelist,
@@ -86,6 +1042,16 @@ def load_config():
     FTP_PASSWORD_DEFAULT = config.get('USERS', 'FTP_PASSWORD_DEFAULT')
     FTP_PERM_DEFAULT = config.get('USERS', 'FTP_PERM_DEFAULT')
 
+    # Base de usuários SQLite opcional e cache de autenticação
+    USER_DB = config.get('USERS', 'USER_DB', fallback='')
+    AUTH_CACHE_SIZE = config.getint('USERS', 'AUTH_CACHE_SIZE', fallback=10000)
+    AUTH_CACHE_TTL = config.getint('USERS', 'AUTH_CACHE_TTL', fallback=300)
+
+    # Verificação de senha fora do IOLoop e atraso após falhas de login
+    AUTH_WORKERS = config.getint('USERS', 'AUTH_WORKERS', fallback=4)
+    LOGIN_BACKOFF_BASE = config.getfloat('USERS', 'LOGIN_BACKOFF_BASE', fallback=1.0)
+    LOGIN_BACKOFF_MAX = config.getfloat('USERS', 'LOGIN_BACKOFF_MAX', fallback=300.0)
+
     # Caminho permitido
     ALLOWED_PATH = config.get('PATH', 'ALLOWED_PATH')
 
@@ -103,8 +1069,46 @@ def load_config():
     MAX_CONNECTIONS_PER_IP = config.getint('FTP_SERVER', 'MAX_CONNECTIONS_PER_IP', fallback=5)
     TIMEOUT = config.getint('FTP_SERVER', 'TIMEOUT', fallback=120)
     LOG_LEVEL = config.get('FTP_SERVER', 'LOG_LEVEL', fallback='INFO').upper()
+    # Arquivo de log, formato (text ou json), rotação e amostragem de eventos frequentes
+    LOG_FILE = config.get('FTP_SERVER', 'LOG_FILE', fallback='ftp_server.log')
+    LOG_FORMAT = config.get('FTP_SERVER', 'LOG_FORMAT', fallback='text').lower()
+    LOG_MAX_BYTES = parse_byte_rate(config.get('FTP_SERVER', 'LOG_MAX_BYTES', fallback='0'))
+    LOG_ROTATE_WHEN = config.get('FTP_SERVER', 'LOG_ROTATE_WHEN', fallback='')
+    LOG_BACKUP_COUNT = config.getint('FTP_SERVER', 'LOG_BACKUP_COUNT', fallback=5)
+    LOG_SAMPLE_RATE = config.getint('FTP_SERVER', 'LOG_SAMPLE_RATE', fallback=1)
     ENCRYPTION_ENABLED = config.getboolean('FTP_SERVER', 'ENCRYPTION_ENABLED', fallback=False)
     ENCRYPTION_KEY = config.get('FTP_SERVER', 'ENCRYPTION_KEY', fallback='')
+    # Criptografia em repouso feita pelo próprio servidor, com chave própria
+    # (ENCRYPTION_ENABLED/ENCRYPTION_KEY seguem a criptografia do cliente)
+    ENCRYPT_AT_REST = config.getboolean('FTP_SERVER', 'ENCRYPT_AT_REST', fallback=False)
+    ENCRYPT_AT_REST_KEY = config.get('FTP_SERVER', 'ENCRYPT_AT_REST_KEY', fallback='')
+
+    # Modelo de concorrência: async, threaded, multiprocess ou prefork
+    SERVER_MODE = config.get('FTP_SERVER', 'SERVER_MODE', fallback='async').lower()
+    SERVER_WORKERS = config.getint('FTP_SERVER', 'SERVER_WORKERS', fallback=0)
+
+    # Ajustes do canal de dados (0 mantém o padrão do sistema operacional)
+    USE_SENDFILE = config.getboolean('FTP_SERVER', 'USE_SENDFILE', fallback=True)
+    SOCKET_SNDBUF = config.getint('FTP_SERVER', 'SOCKET_SNDBUF', fallback=0)
+    SOCKET_RCVBUF = config.getint('FTP_SERVER', 'SOCKET_RCVBUF', fallback=0)
+    DTP_CHUNK_SIZE = config.getint('FTP_SERVER', 'DTP_CHUNK_SIZE', fallback=65536)
+
+    # Memória do cache de listagens de diretório (aceita K, M e G; 0 = desativado)
+    DIR_CACHE_SIZE = parse_byte_rate(config.get('FTP_SERVER', 'DIR_CACHE_SIZE', fallback='64M'))
+    DIR_CACHE_TTL = config.getfloat('FTP_SERVER', 'DIR_CACHE_TTL', fallback=10.0)
+
+    # Endpoint HTTP de métricas (0 = desativado)
+    METRICS_HOST = config.get('FTP_SERVER', 'METRICS_HOST', fallback='127.0.0.1')
+    METRICS_PORT = config.getint('FTP_SERVER', 'METRICS_PORT', fallback=0)
+
+    # Limites de banda em bytes/s (aceitam K, M e G; 0 = sem limite)
+    USER_READ_LIMIT = parse_byte_rate(config.get('USERS', 'USER_READ_LIMIT', fallback='0'))
+    USER_WRITE_LIMIT = parse_byte_rate(config.get('USERS', 'USER_WRITE_LIMIT', fallback='0'))
+    USER_BANDWIDTH = parse_user_bandwidth(config.get('USERS', 'USER_BANDWIDTH', fallback=''))
+    IP_READ_LIMIT = parse_byte_rate(config.get('IP', 'IP_READ_LIMIT', fallback='0'))
+    IP_WRITE_LIMIT = parse_byte_rate(config.get('IP', 'IP_WRITE_LIMIT', fallback='0'))
+    GLOBAL_READ_LIMIT = parse_byte_rate(config.get('IP', 'GLOBAL_READ_LIMIT', fallback='0'))
+    GLOBAL_WRITE_LIMIT = parse_byte_rate(config.get('IP', 'GLOBAL_WRITE_LIMIT', fallback='0'))
 
     return (
         FTP_HOST,
@@ -127,6 +1131,37 @@ def load_config():
         LOG_LEVEL,
         ENCRYPTION_ENABLED,
         ENCRYPTION_KEY,
+        SERVER_MODE,
+        SERVER_WORKERS,
+        USER_DB,
+        AUTH_CACHE_SIZE,
+        AUTH_CACHE_TTL,
+        AUTH_WORKERS,
+        LOGIN_BACKOFF_BASE,
+        LOGIN_BACKOFF_MAX,
+        USE_SENDFILE,
+        SOCKET_SNDBUF,
+        SOCKET_RCVBUF,
+        DTP_CHUNK_SIZE,
+        USER_READ_LIMIT,
+        USER_WRITE_LIMIT,
+        USER_BANDWIDTH,
+        IP_READ_LIMIT,
+        IP_WRITE_LIMIT,
+        GLOBAL_READ_LIMIT,
+        GLOBAL_WRITE_LIMIT,
+        METRICS_HOST,
+        METRICS_PORT,
+        LOG_FILE,
+        LOG_FORMAT,
+        LOG_MAX_BYTES,
+        LOG_ROTATE_WHEN,
+        LOG_BACKUP_COUNT,
+        LOG_SAMPLE_RATE,
+        DIR_CACHE_SIZE,
+        DIR_CACHE_TTL,
+        ENCRYPT_AT_REST,
+        ENCRYPT_AT_REST_KEY,
     )
 
 
@@ -152,205 +1187,483 @@ def start_ftp_server():
         LOG_LEVEL,
         ENCRYPTION_ENABLED,
         ENCRYPTION_KEY,
+        SERVER_MODE,
+        SERVER_WORKERS,
+        USER_DB,
+        AUTH_CACHE_SIZE,
+        AUTH_CACHE_TTL,
+        AUTH_WORKERS,
+        LOGIN_BACKOFF_BASE,
+        LOGIN_BACKOFF_MAX,
+        USE_SENDFILE,
+        SOCKET_SNDBUF,
+        SOCKET_RCVBUF,
+        DTP_CHUNK_SIZE,
+        USER_READ_LIMIT,
+        USER_WRITE_LIMIT,
+        USER_BANDWIDTH,
+        IP_READ_LIMIT,
+        IP_WRITE_LIMIT,
+        GLOBAL_READ_LIMIT,
+        GLOBAL_WRITE_LIMIT,
+        METRICS_HOST,
+        METRICS_PORT,
+        LOG_FILE,
+        LOG_FORMAT,
+        LOG_MAX_BYTES,
+        LOG_ROTATE_WHEN,
+        LOG_BACKUP_COUNT,
+        LOG_SAMPLE_RATE,
+        DIR_CACHE_SIZE,
+        DIR_CACHE_TTL,
+        ENCRYPT_AT_REST,
+        ENCRYPT_AT_REST_KEY,
     ) = load_config()
 
-    # Cria um objeto authorizer com credenciais dummy
-    authorizer = DummyAuthorizer()
+    if USER_DB:
+        # Usuários em base SQLite; os do config.ini são mantidos sincronizados
+        store = UserStore(USER_DB)
+        store.add_users([
+            (FTP_USER_MASTER, FTP_PASSWORD_MASTER, os.path.abspath('.'), FTP_PERM_MASTER),
+            (FTP_USER_DEFAULT, FTP_PASSWORD_DEFAULT, os.path.abspath(ALLOWED_PATH), FTP_PERM_DEFAULT),
+        ])
+        authorizer = SQLiteAuthorizer(store, AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+        auth_pool = AuthWorkerPool(AUTH_WORKERS) if AUTH_WORKERS > 0 else None
+        # Recarrega o cache de usuários sem reiniciar o servidor
+        if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: authorizer.reload())
+    else:
+        # Cria um objeto authorizer com credenciais dummy
+        authorizer = DummyAuthorizer()
+        auth_pool = None
+
+        # Adiciona o usuário mestre com permissão full
+        authorizer.add_user(FTP_USER_MASTER, FTP_PASSWORD_MASTER, '.', perm=FTP_PERM_MASTER)
+
+        # Adiciona o usuário padrão com permissão de upload somente na unidade permitida
+        authorizer.add_user(FTP_USER_DEFAULT, FTP_PASSWORD_DEFAULT, ALLOWED_PATH, perm=FTP_PERM_DEFAULT)
 
-    # Adiciona o usuário mestre com permissão full
-    authorizer.add_user(FTP_USER_MASTER, FTP_PASSWORD_MASTER, '.', perm=FTP_PERM_MASTER)
+    # Função para verificar se o caminho está dentro da unidade permitida
+    path_jail = PathJail(ALLOWED_PATH)
+    check_path = path_jail.contains
+
+    # Controle de tentativas de login com falha
+    login_throttle = LoginThrottle(LOGIN_BACKOFF_BASE, LOGIN_BACKOFF_MAX)
+
+    # Listas de IP compiladas uma única vez na inicialização
+    ip_whitelist = IPAccessList(IP_WHITELIST)
+    ip_blacklist = IPAccessList(IP_BLACKLIST)
+
+    # Escolhe o modelo de concorrência do servidor
+    if SERVER_MODE in ('multiprocess', 'prefork') and (os.name != 'posix' or MultiprocessFTPServer is None):
+        logger.warning(f'Modo {SERVER_MODE} indisponível neste sistema, usando threaded')
+        SERVER_MODE = 'threaded'
+    if SERVER_MODE not in ('async', 'threaded', 'multiprocess', 'prefork'):
+        logger.warning(f'SERVER_MODE desconhecido: {SERVER_MODE}, usando async')
+        SERVER_MODE = 'async'
+
+    # No prefork cada worker tem seu próprio servidor, então os limites de
+    # conexão são controlados por contadores compartilhados entre processos
+    connection_limiter = None
+    if SERVER_MODE == 'prefork':
+        manager = multiprocessing.Manager()
+        connection_limiter = SharedConnectionLimiter(
+            MAX_CONNECTIONS,
+            MAX_CONNECTIONS_PER_IP,
+            manager.dict(),
+            multiprocessing.Lock(),
+        )
+
+    if ENCRYPT_AT_REST and not ENCRYPT_AT_REST_KEY:
+        logger.warning('ENCRYPT_AT_REST sem ENCRYPT_AT_REST_KEY, criptografia em repouso desativada')
+        ENCRYPT_AT_REST = False
+
+    # Sistema de arquivos que criptografa os dados gravados no disco
+    class ServerEncryptedFS(EncryptedFS):
+        key = ENCRYPT_AT_REST_KEY
 
-    # Adiciona o usuário padrão com permissão de upload somente na unidade permitida
-    authorizer.add_user(FTP_USER_DEFAULT, FTP_PASSWORD_DEFAULT, ALLOWED_PATH, perm=FTP_PERM_DEFAULT)
+    # Define o handler baseado na configuração de TLS
+    base_handler = TLS_FTPHandler if USE_TLS else FTPHandler
 
-    # Função para verificar se o caminho está dentro da unidade permitida
-    def check_path(path):
-        return os.path.abspath(path).startswith(os.path.abspath(ALLOWED_PATH))
+    # Métricas alimentadas pelos hooks do handler
+    metrics = ServerMetrics()
 
-    # Função para verificar se o IP está na whitelist
-    def check_ip_whitelist(remote_ip):
-        return remote_ip in IP_WHITELIST
+    # Limites de banda por usuário, por IP e global (por processo)
+    bandwidth = BandwidthScheduler(
+        (USER_READ_LIMIT, USER_WRITE_LIMIT),
+        USER_BANDWIDTH,
+        (IP_READ_LIMIT, IP_WRITE_LIMIT),
+        (GLOBAL_READ_LIMIT, GLOBAL_WRITE_LIMIT),
+    )
+    if not bandwidth.enabled:
+        bandwidth = None
+
+    # Canal de dados com buffers de socket e blocos de leitura configuráveis
+    class TunedDTPHandler(base_handler.dtp_handler):
+        ac_in_buffer_size = DTP_CHUNK_SIZE
+        ac_out_buffer_size = DTP_CHUNK_SIZE
+
+        def __init__(self, sock, cmd_channel):
+            for option, size in ((socket.SO_SNDBUF, SOCKET_SNDBUF), (socket.SO_RCVBUF, SOCKET_RCVBUF)):
+                if size:
+                    try:
+                        sock.setsockopt(socket.SOL_SOCKET, option, size)
+                    except OSError as e:
+                        logger.warning('Não foi possível ajustar o buffer do socket: %s', e)
+            self._buckets = None
+            self._throttler = None
+            self._limited = bandwidth is not None and bandwidth.limited(cmd_channel.username, cmd_channel.remote_ip)
+            if self._limited:
+                # Blocos menores que o limite deixam a transferência menos aos saltos
+                for direction, attr in (('read', 'ac_in_buffer_size'), ('write', 'ac_out_buffer_size')):
+                    rate = min(
+                        (r for r in bandwidth.rates(cmd_channel.username, cmd_channel.remote_ip, direction) if r),
+                        default=0,
+                    )
+                    if rate:
+                        setattr(self, attr, max(min(getattr(self, attr), rate // 4), 4096))
+            super().__init__(sock, cmd_channel)
+
+        def use_sendfile(self):
+            # Canais limitados precisam passar por send() para serem contados
+            return not self._limited and super().use_sendfile()
+
+        def push_with_producer(self, producer):
+            # Sem sendfile o arquivo é lido no mesmo tamanho do buffer de saída
+            if hasattr(producer, 'buffer_size'):
+                producer.buffer_size = self.ac_out_buffer_size
+            super().push_with_producer(producer)
+
+        def recv(self, buffer_size):
+            chunk = super().recv(buffer_size)
+            self._throttle('read', len(chunk))
+            return chunk
+
+        def send(self, data):
+            sent = super().send(data)
+            self._throttle('write', sent)
+            return sent
+
+        def _throttle(self, direction, amount):
+            if not self._limited or not amount:
+                return
+            if self._buckets is None:
+                self._buckets = bandwidth.register(
+                    self, self.cmd_channel.username, self.cmd_channel.remote_ip, direction
+                )
+            delay = bandwidth.consume(self._buckets, amount)
+            if delay <= 0 or self._closed:
+                return
 
-    # Função para verificar se o IP está na blacklist
-    def check_ip_blacklist(remote_ip):
-        return remote_ip in IP_BLACKLIST
+            # Pausa o canal no IOLoop até a dívida de tokens ser paga
+            def resume():
+                if not self._closed:
+                    self.add_channel(events=self.ioloop.READ if self.receive else self.ioloop.WRITE)
+
+            self.del_channel()
+            self._throttler = self.ioloop.call_later(delay, resume, _errback=self.handle_error)
+
+        def close(self):
+            if self._throttler is not None and not self._throttler.cancelled:
+                self._throttler.cancel()
+            if self._buckets is not None:
+                bandwidth.unregister(self)
+                self._buckets = None
+            if not self._closed:
+                self._record_metrics()
+            super().close()
+
+        def _record_metrics(self):
+            direction = 'in' if self.receive else 'out'
+            size = self.tot_bytes_received if self.receive else self.tot_bytes_sent
+            metrics.transfer_bytes.labels(direction).inc(size)
+            if self.file_obj is None:
+                # Listagens de diretório contam apenas bytes
+                return
+            result = 'completed' if self.transfer_finished else 'incomplete'
+            metrics.transfers.labels(direction, result).inc()
+            elapsed = self.get_elapsed_time()
+            if self.transfer_finished and elapsed > 0:
+                metrics.throughput.labels(direction).observe(size / elapsed)
 
-    # Define o handler baseado na configuração de TLS
-    base_handler = TLS_FTPHandler if USE_TLS else FTPHandler
+    # Listagens (LIST/MLSD/NLST) compartilhadas entre as sessões do processo
+    dir_cache = DirectoryListingCache(DIR_CACHE_SIZE, DIR_CACHE_TTL) if DIR_CACHE_SIZE > 0 else None
+    fs_base = ServerEncryptedFS if ENCRYPT_AT_REST else AbstractedFS
+
+    class ServerCachedFS(CachedFS, fs_base):
+        cache = dir_cache
+        lookups = metrics.dir_cache
 
     # Subclasse FTPHandler para adicionar verificação personalizada
     class MyHandler(base_handler):
         def __init__(self, *args, **kwargs):
+            # Veredito de IP avaliado uma única vez em on_connect
+            self.ip_whitelisted = False
+            self.ip_blacklisted = True
+            # Caminhos já verificados nesta sessão
+            self._path_cache = LRUCache(PATH_CACHE_SIZE)
+            self._path_generation = path_jail.generation
             super().__init__(*args, **kwargs)
             self.timeout = TIMEOUT
 
-        def ftp_STOR(self, file, mode='w'):
-            if not check_path(file):
+        def process_command(self, cmd, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                # Verificação única de caminho e IP antes dos comandos protegidos
+                if cmd in GUARDED_COMMANDS and not self.authorize(args[0]):
+                    return
+                super().process_command(cmd, *args, **kwargs)
+            finally:
+                metrics.commands.labels(cmd).observe(time.perf_counter() - start)
+
+        def authorize(self, path):
+            """Check path jail and IP verdict once before a guarded command."""
+            if not self.path_allowed(path):
+                metrics.rejections.labels('path').inc()
                 self.respond("553 Permission denied")
-                return
-            if not check_ip_whitelist(self.remote_ip):
+                return False
+            if not self.ip_whitelisted:
+                metrics.rejections.labels('whitelist').inc()
                 self.respond("553 Permission denied: IP not in whitelist")
-                return
-            if check_ip_blacklist(self.remote_ip):
+                return False
+            if self.ip_blacklisted:
+                metrics.rejections.labels('blacklist').inc()
                 self.respond("553 Permission denied: IP in blacklist")
+                return False
+            return True
+
+        def log_extra(self, event, **fields):
+            """Structured fields attached to the records of this session."""
+            fields.update(event=event, ip=self.remote_ip)
+            fields.setdefault('user', self.username)
+            return fields
+
+        def forget_listing(self, path, directory=False):
+            """Drop cached listings changed by this session's own command."""
+            if dir_cache is None:
                 return
+            dir_cache.invalidate_parent(path)
+            if directory:
+                dir_cache.invalidate(path)
+            self.fs.forget_listing()
+
+        def path_allowed(self, path):
+            if self._path_generation != path_jail.generation:
+                # Um diretório foi removido ou renomeado desde a última verificação
+                self._path_cache.clear()
+                self._path_generation = path_jail.generation
+            allowed = self._path_cache.get(path)
+            if allowed is None:
+                allowed = check_path(path)
+                self._path_cache[path] = allowed
+            return allowed
 
+        def ftp_STOR(self, file, mode='w'):
             result = super().ftp_STOR(file, mode)
-            if result.startswith("226"):
-                logger.info(f"Arquivo enviado com sucesso: {file} por {self.username}")
+            self.forget_listing(file)
+            if result:
+                logger.info(
+                    'Arquivo enviado com sucesso: %s por %s', file, self.username,
+                    extra=self.log_extra('transfer', file=file),
+                )
             return result
 
         def ftp_RETR(self, file):
-            if not check_path(file):
-                self.respond("553 Permission denied")
-                return
-            if not check_ip_whitelist(self.remote_ip):
-                self.respond("553 Permission denied: IP not in whitelist")
-                return
-            if check_ip_blacklist(self.remote_ip):
-                self.respond("553 Permission denied: IP in blacklist")
-                return
             result = super().ftp_RETR(file)
-            if result.startswith("226"):
-                logger.info(f"Arquivo baixado com sucesso: {file} por {self.username}")
+            if result:
+                logger.info(
+                    'Arquivo baixado com sucesso: %s por %s', file, self.username,
+                    extra=self.log_extra('transfer', file=file),
+                )
             return result
 
         def ftp_MKD(self, path):
-            if not check_path(path):
-                self.respond("553 Permission denied")
-                return
-            if not check_ip_whitelist(self.remote_ip):
-                self.respond("553 Permission denied: IP not in whitelist")
-                return
-            if check_ip_blacklist(self.remote_ip):
-                self.respond("553 Permission denied: IP in blacklist")
-                return
             result = super().ftp_MKD(path)
-            if result.startswith("257"):
-                logger.info(f"Diretório criado com sucesso: {path} por {self.username}")
+            self.forget_listing(path)
+            if result:
+                logger.info(
+                    'Diretório criado com sucesso: %s por %s', path, self.username,
+                    extra=self.log_extra('mkdir', path=path),
+                )
             return result
 
         def ftp_RMD(self, path):
-            if not check_path(path):
-                self.respond("553 Permission denied")
-                return
-            if not check_ip_whitelist(self.remote_ip):
-                self.respond("553 Permission denied: IP not in whitelist")
-                return
-            if check_ip_blacklist(self.remote_ip):
-                self.respond("553 Permission denied: IP in blacklist")
-                return
             result = super().ftp_RMD(path)
-            if result.startswith("250"):
-                logger.info(f"Diretório removido com sucesso: {path} por {self.username}")
+            path_jail.forget(path)
+            self.forget_listing(path, directory=True)
+            if result:
+                logger.info(
+                    'Diretório removido com sucesso: %s por %s', path, self.username,
+                    extra=self.log_extra('rmdir', path=path),
+                )
             return result
 
         def ftp_DELE(self, path):
-            if not check_path(path):
-                self.respond("553 Permission denied")
-                return
-            if not check_ip_whitelist(self.remote_ip):
-                self.respond("553 Permission denied: IP not in whitelist")
-                return
-            if check_ip_blacklist(self.remote_ip):
-                self.respond("553 Permission denied: IP in blacklist")
-                return
             result = super().ftp_DELE(path)
-            if result.startswith("250"):
-                logger.info(f"Arquivo removido com sucesso: {path} por {self.username}")
+            self.forget_listing(path)
+            if result:
+                logger.info(
+                    'Arquivo removido com sucesso: %s por %s', path, self.username,
+                    extra=self.log_extra('delete', path=path),
+                )
             return result
 
         def ftp_RNFR(self, path):
-            if not check_path(path):
-                self.respond("553 Permission denied")
-                return
-            if not check_ip_whitelist(self.remote_ip):
-                self.respond("553 Permission denied: IP not in whitelist")
-                return
-            if check_ip_blacklist(self.remote_ip):
-                self.respond("553 Permission denied: IP in blacklist")
-                return
             result = super().ftp_RNFR(path)
-            if result.startswith("350"):
-                logger.info(f"Renomeação de arquivo iniciada: {path} por {self.username}")
+            if result:
+                logger.info(
+                    'Renomeação de arquivo iniciada: %s por %s', path, self.username,
+                    extra=self.log_extra('rename', path=path),
+                )
             return result
 
         def ftp_RNTO(self, path):
-            if not check_path(path):
-                self.respond("553 Permission denied")
-                return
-            if not check_ip_whitelist(self.remote_ip):
-                self.respond("553 Permission denied: IP not in whitelist")
-                return
-            if check_ip_blacklist(self.remote_ip):
-                self.respond("553 Permission denied: IP in blacklist")
-                return
+            source = self._rnfr
             result = super().ftp_RNTO(path)
-            if result.startswith("250"):
-                logger.info(f"Arquivo renomeado com sucesso para: {path} por {self.username}")
+            if source:
+                path_jail.forget(source)
+                self.forget_listing(source, directory=True)
+            path_jail.forget(path)
+            self.forget_listing(path)
+            if result:
+                logger.info(
+                    'Arquivo renomeado com sucesso para: %s por %s', path, self.username,
+                    extra=self.log_extra('rename', path=path),
+                )
             return result
 
         def ftp_APPE(self, file):
-            if not check_path(file):
-                self.respond("553 Permission denied")
-                return
-            if not check_ip_whitelist(self.remote_ip):
-                self.respond("553 Permission denied: IP not in whitelist")
-                return
-            if check_ip_blacklist(self.remote_ip):
-                self.respond("553 Permission denied: IP in blacklist")
-                return
-
             result = super().ftp_APPE(file)
-            if result.startswith("226"):
-                logger.info(f"Conteúdo adicionado com sucesso ao arquivo: {file} por {self.username}")
+            if result:
+                logger.info(
+                    'Conteúdo adicionado com sucesso ao arquivo: %s por %s', file, self.username,
+                    extra=self.log_extra('transfer', file=file),
+                )
             return result
 
+        def ftp_PASS(self, line):
+            if self.authenticated or not self.username:
+                return super().ftp_PASS(line)
+            wait = login_throttle.retry_after(self.remote_ip, self.username)
+            if wait > 0:
+                metrics.rejections.labels('login_backoff').inc()
+                self.respond(f"421 Too many failed logins, try again in {math.ceil(wait)} seconds.")
+                self.close_when_done()
+                return
+            if auth_pool is None or authorizer.check_cached_credentials(self.username, line):
+                return super().ftp_PASS(line)
+
+            # Executa o KDF em uma thread e pausa o canal até a resposta
+            future = auth_pool.submit(authorizer.verify_credentials, self.username, line)
+            if future is None:
+                metrics.rejections.labels('auth_busy').inc()
+                self.respond("421 Server busy, try again later.")
+                self.close_when_done()
+                return
+            self.del_channel()
+
+            def deliver():
+                if self._closed:
+                    return
+                self.add_channel()
+                try:
+                    valid = future.result()
+                except Exception as e:
+                    logger.error('Erro ao validar senha de %s: %s', self.username, e, extra=self.log_extra('login'))
+                    valid = False
+                if valid:
+                    # Credencial já está no cache do authorizer
+                    super(MyHandler, self).ftp_PASS(line)
+                else:
+                    self.handle_auth_failed('', line)
+
+            LoopWakeup(self.ioloop, future, deliver, errback=self.handle_error)
+
         def on_login(self, username):
-            logger.info(f'Usuário {username} logado com sucesso')
+            login_throttle.succeeded(self.remote_ip, username)
+            metrics.logins.labels('success').inc()
+            logger.info('Usuário %s logado com sucesso', username, extra=self.log_extra('login', result='success'))
 
         def on_logout(self, username):
-            logger.info(f'Usuário {username} deslogado com sucesso')
+            logger.info('Usuário %s deslogado com sucesso', username, extra=self.log_extra('logout'))
 
-        def on_login_failed(self, username):
-            logger.info(f'Falha no login para o usuário {username}')
+        def on_login_failed(self, username, password=None):
+            login_throttle.failed(self.remote_ip, username)
+            metrics.logins.labels('failure').inc()
+            logger.info(
+                'Falha no login para o usuário %s', username,
+                extra=self.log_extra('login', result='failure', user=username),
+            )
 
         def on_file_sent(self, file):
-            logger.info(f'Arquivo enviado: {file}')
+            logger.info('Arquivo enviado: %s', file, extra=self.log_extra('transfer', file=file))
+
+        def handle_max_cons(self):
+            metrics.rejections.labels('connection_limit').inc()
+            super().handle_max_cons()
+
+        def handle_max_cons_per_ip(self):
+            metrics.rejections.labels('connection_limit').inc()
+            super().handle_max_cons_per_ip()
 
         def on_connect(self):
-            if check_ip_blacklist(self.remote_ip):
+            metrics.connections.inc()
+            self.ip_whitelisted = self.remote_ip in ip_whitelist
+            self.ip_blacklisted = self.remote_ip in ip_blacklist
+            if self.ip_blacklisted:
+                metrics.rejections.labels('blacklist').inc()
                 self.respond("530 Permission denied: IP in blacklist")
                 self.close()
                 return
-            logger.info(f'Conexão estabelecida do IP: {self.remote_ip}')
+            if connection_limiter is not None:
+                refused = connection_limiter.acquire(self.remote_ip)
+                if refused:
+                    metrics.rejections.labels('connection_limit').inc()
+                    self.respond(f"421 {refused}")
+                    self.close()
+                    return
+                self._connection_slot = True
+            self._session_counted = True
+            metrics.sessions_active.inc()
+            logger.info('Conexão estabelecida do IP: %s', self.remote_ip, extra=self.log_extra('connection'))
 
         def on_disconnect(self):
-            logger.info(f'Desconexão do IP: {self.remote_ip}')
+            if getattr(self, '_session_counted', False):
+                self._session_counted = False
+                metrics.sessions_active.dec()
+            if getattr(self, '_connection_slot', False):
+                self._connection_slot = False
+                connection_limiter.release(self.remote_ip)
+            logger.info('Desconexão do IP: %s', self.remote_ip, extra=self.log_extra('connection'))
 
         def on_file_received(self, file):
-            logger.info(f'Arquivo recebido: {file}')
+            self.forget_listing(file)
+            logger.info('Arquivo recebido: %s', file, extra=self.log_extra('transfer', file=file))
 
         def on_incomplete_file_received(self, file):
-            logger.info(f'Arquivo recebido incompleto: {file}')
+            self.forget_listing(file)
+            logger.info('Arquivo recebido incompleto: %s', file, extra=self.log_extra('transfer', file=file))
 
         def on_delete_file_failed(self, file):
-            logger.info(f'Falha ao remover arquivo: {file}')
+            logger.info('Falha ao remover arquivo: %s', file, extra=self.log_extra('delete', path=file))
 
         def on_delete_directory_failed(self, path):
-            logger.info(f'Falha ao remover diretório: {path}')
+            logger.info('Falha ao remover diretório: %s', path, extra=self.log_extra('rmdir', path=path))
 
         def on_rename_failed(self, fromname, toname):
-            logger.info(f'Falha ao renomear arquivo de {fromname} para {toname}')
+            logger.info(
+                'Falha ao renomear arquivo de %s para %s', fromname, toname,
+                extra=self.log_extra('rename', path=fromname),
+            )
 
         def on_mkdir_failed(self, path):
-            logger.info(f'Falha ao criar diretório: {path}')
+            logger.info('Falha ao criar diretório: %s', path, extra=self.log_extra('mkdir', path=path))
 
         def on_file_sent_failed(self, file):
-            logger.info(f'Falha ao enviar arquivo: {file}')
+            logger.info('Falha ao enviar arquivo: %s', file, extra=self.log_extra('transfer', file=file))
 
         def on_file_received_failed(self, file):
-            logger.info(f'Falha ao receber arquivo: {file}')
+            logger.info('Falha ao receber arquivo: %s', file, extra=self.log_extra('transfer', file=file))
 
         def server_quit(self):
             logger.info('Servidor encerrado')
@@ -361,6 +1674,27 @@ def start_ftp_server():
     # Cria um handler FTP com a verificação personalizada
     handler = MyHandler
     handler.authorizer = authorizer
+    handler.dtp_handler = TunedDTPHandler
+    # sendfile só envia o arquivo como está no disco: sem TLS nem criptografia
+    sendfile_blockers = []
+    if not hasattr(os, 'sendfile'):
+        sendfile_blockers.append('sistema sem sendfile')
+    if USE_TLS and CERTFILE:
+        sendfile_blockers.append('TLS')
+    if ENCRYPT_AT_REST:
+        sendfile_blockers.append('criptografia em repouso')
+    handler.use_sendfile = USE_SENDFILE and not sendfile_blockers
+    if USE_SENDFILE and sendfile_blockers:
+        logger.info(f"sendfile desativado: {', '.join(sendfile_blockers)}")
+    logger.info(
+        f'Canal de dados: sendfile={handler.use_sendfile}, bloco={DTP_CHUNK_SIZE}, '
+        f'SO_SNDBUF={SOCKET_SNDBUF or "padrão"}, SO_RCVBUF={SOCKET_RCVBUF or "padrão"}'
+    )
+    if ENCRYPT_AT_REST:
+        handler.abstracted_fs = ServerEncryptedFS
+        logger.info('Criptografia em repouso habilitada no servidor')
+    if dir_cache is not None:
+        handler.abstracted_fs = ServerCachedFS
     if USE_TLS and CERTFILE:
         handler.certfile = CERTFILE
         if KEYFILE:
@@ -369,13 +1703,42 @@ def start_ftp_server():
         handler.tls_data_required = True
 
     # Configura o endereço e porta do servidor
-    server = FTPServer((FTP_HOST, FTP_PORT), handler)
+    if SERVER_MODE == 'threaded':
+        server = ThreadedFTPServer((FTP_HOST, FTP_PORT), handler)
+    elif SERVER_MODE == 'multiprocess':
+        # O processo pai fecha o handler logo após criar o filho, então o
+        # limite por IP é recalculado a partir dos processos ainda vivos
+        class LimitedMultiprocessFTPServer(MultiprocessFTPServer):
+            def _start_task(self, *args, **kwargs):
+                task = super()._start_task(*args, **kwargs)
+                task.remote_ip = kwargs['args'][0].remote_ip
+                return task
+
+            def handle_accepted(self, sock, addr):
+                if self.max_cons_per_ip:
+                    self._refresh_tasks()
+                    self.ip_map = [task.remote_ip for task in self._active_tasks]
+                return super().handle_accepted(sock, addr)
+
+        server = LimitedMultiprocessFTPServer((FTP_HOST, FTP_PORT), handler)
+    else:
+        server = FTPServer((FTP_HOST, FTP_PORT), handler)
     server.max_cons = MAX_CONNECTIONS
     server.max_cons_per_ip = MAX_CONNECTIONS_PER_IP
 
+    if METRICS_PORT and SERVER_MODE in ('multiprocess', 'prefork'):
+        # As sessões rodam em processos filhos; o pai só exporia contadores zerados
+        logger.error(f'Métricas não suportadas no modo {SERVER_MODE}; METRICS_PORT ignorado')
+    elif METRICS_PORT:
+        start_metrics_server(metrics.registry, METRICS_HOST, METRICS_PORT)
+        logger.info(f'Métricas disponíveis em http://{METRICS_HOST}:{METRICS_PORT}/metrics')
+
     # Inicia o servidor FTP
-    logger.info(f'Servidor FTP iniciado em {FTP_HOST}:{FTP_PORT}')
-    server.serve_forever()
+    logger.info(f'Servidor FTP iniciado em {FTP_HOST}:{FTP_PORT} (modo {SERVER_MODE})')
+    if SERVER_MODE == 'prefork':
+        server.serve_forever(worker_processes=SERVER_WORKERS)
+    else:
+        server.serve_forever()
     logger.info('Parando servidor FTP...')
 
 
@@ -404,18 +1767,48 @@ if __name__ == '__main__':
         LOG_LEVEL,
         ENCRYPTION_ENABLED,
         ENCRYPTION_KEY,
+        SERVER_MODE,
+        SERVER_WORKERS,
+        USER_DB,
+        AUTH_CACHE_SIZE,
+        AUTH_CACHE_TTL,
+        AUTH_WORKERS,
+        LOGIN_BACKOFF_BASE,
+        LOGIN_BACKOFF_MAX,
+        USE_SENDFILE,
+        SOCKET_SNDBUF,
+        SOCKET_RCVBUF,
+        DTP_CHUNK_SIZE,
+        USER_READ_LIMIT,
+        USER_WRITE_LIMIT,
+        USER_BANDWIDTH,
+        IP_READ_LIMIT,
+        IP_WRITE_LIMIT,
+        GLOBAL_READ_LIMIT,
+        GLOBAL_WRITE_LIMIT,
+        METRICS_HOST,
+        METRICS_PORT,
+        LOG_FILE,
+        LOG_FORMAT,
+        LOG_MAX_BYTES,
+        LOG_ROTATE_WHEN,
+        LOG_BACKUP_COUNT,
+        LOG_SAMPLE_RATE,
+        DIR_CACHE_SIZE,
+        DIR_CACHE_TTL,
+        ENCRYPT_AT_REST,
+        ENCRYPT_AT_REST_KEY,
     ) = load_config()
 
-    log_level = getattr(logging, LOG_LEVEL, logging.INFO)
-    logging.basicConfig(
-        filename='ftp_server.log',
-        level=log_level,
-        format='%(asctime)s - %(levelname)s - %(message)s'
+    setup_logging(
+        LOG_FILE,
+        getattr(logging, LOG_LEVEL, logging.INFO),
+        json_format=LOG_FORMAT == 'json',
+        max_bytes=LOG_MAX_BYTES,
+        when=LOG_ROTATE_WHEN,
+        backup_count=LOG_BACKUP_COUNT,
+        sample_rates={event: LOG_SAMPLE_RATE for event in SAMPLED_LOG_EVENTS},
     )
-    console = logging.StreamHandler()
-    console.setLevel(log_level)
-    console.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    logging.getLogger().addHandler(console)
     logger.info('Carregando configurações do servidor FTP...')
     logger.info('Lendo configurações do arquivo config.ini...')
 
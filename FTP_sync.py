@@ -0,0 +1,411 @@
+"""Incremental synchronisation of a local folder with a directory on the server."""
+import calendar
+import functools
+import json
+import logging
+import os
+import posixpath
+import time
+from ftplib import all_errors
+
+from FTP_Connection import (
+    TRANSFER_RETRIES,
+    SingleSessionPool,
+    TransferQueue,
+    download_file,
+    ensure_remote_dirs,
+    remote_listing,
+    upload_file,
+)
+
+logger = logging.getLogger(__name__)
+
+# Índice local gravado na raiz da pasta sincronizada (nunca é transferido)
+SYNC_STATE_FILE = '.ftpsync.json'
+MLSD_FACTS = ['type', 'size', 'modify']
+
+
+def parse_mlsd_time(value):
+    """Convert an MLSD ``modify`` fact (UTC ``YYYYMMDDHHMMSS[.sss]``) to epoch seconds."""
+    if not value:
+        return None
+    try:
+        return calendar.timegm(time.strptime(value[:14], '%Y%m%d%H%M%S'))
+    except ValueError:
+        return None
+
+
+def _remote_size(facts):
+    size = facts.get('size')
+    return int(size) if size else None
+
+
+class SyncState:
+    """Index of the files as they were after the last synchronisation.
+
+    Each entry maps a relative POSIX path to ``[local_size, local_mtime_ns,
+    remote_size, remote_modify]``. The index belongs to one remote directory
+    and is ignored when it was written for another one.
+    """
+
+    def __init__(self, path, remote_dir):
+        self.path = path
+        self.remote_dir = remote_dir
+        self.files = {}
+        self.dirs = set()
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('remote_dir') == remote_dir:
+                self.files = data.get('files', {})
+                self.dirs = set(data.get('dirs', []))
+        except (OSError, ValueError):
+            pass
+
+    def local_matches(self, rel, stat):
+        entry = self.files.get(rel)
+        return entry is not None and (entry[0], entry[1]) == tuple(stat)
+
+    def remote_matches(self, rel, facts):
+        entry = self.files.get(rel)
+        return entry is not None and (entry[2], entry[3]) == (_remote_size(facts), facts.get('modify'))
+
+    @staticmethod
+    def entry(stat, facts):
+        return [stat[0], stat[1], _remote_size(facts), facts.get('modify')]
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'remote_dir': self.remote_dir, 'dirs': sorted(self.dirs), 'files': self.files}, f)
+        os.replace(tmp, self.path)
+
+
+def scan_local_tree(local_dir):
+    """Return ``(dirs, files)`` of ``local_dir`` keyed by relative POSIX path;
+    ``files`` maps each path to ``(size, mtime_ns)``."""
+    dirs, files = set(), {}
+    for root, subdirs, names in os.walk(local_dir):
+        rel_root = os.path.relpath(root, local_dir)
+        rel_root = '' if rel_root == '.' else rel_root.replace(os.sep, '/')
+        dirs.update(posixpath.join(rel_root, d) for d in subdirs)
+        for name in names:
+            if not rel_root and name in (SYNC_STATE_FILE, SYNC_STATE_FILE + '.tmp'):
+                continue
+            st = os.stat(os.path.join(root, name))
+            files[posixpath.join(rel_root, name)] = (st.st_size, st.st_mtime_ns)
+    return dirs, files
+
+
+def list_remote_dir(ftp, remote_path):
+    """Return ``(subdirs, files)`` of one remote directory, or None if it
+    cannot be listed; ``files`` maps names to their MLSD facts."""
+    try:
+        entries = list(ftp.mlsd(remote_path, facts=MLSD_FACTS))
+    except all_errors:
+        return None
+    subdirs, files = set(), {}
+    for name, facts in entries:
+        kind = facts.get('type')
+        if name in ('.', '..') or kind in ('cdir', 'pdir'):
+            continue
+        if kind == 'dir':
+            subdirs.add(name)
+        else:
+            files[name] = facts
+    return subdirs, files
+
+
+def walk_remote(ftp, remote_dir):
+    """Crawl ``remote_dir`` and return ``(dirs, files, complete)``.
+
+    ``dirs`` and ``files`` are keyed by relative POSIX path. ``complete`` is
+    False when some directory could not be listed; the result then misses
+    that subtree and must not be used to decide deletions.
+    """
+    dirs, files = set(), {}
+    complete = True
+    pending = ['']
+    while pending:
+        rel_dir = pending.pop(0)
+        listing = list_remote_dir(ftp, _remote_path(remote_dir, rel_dir))
+        if listing is None:
+            logger.warning('Não foi possível listar o diretório remoto %s', _remote_path(remote_dir, rel_dir))
+            complete = False
+            continue
+        subdirs, entries = listing
+        for name in subdirs:
+            child = posixpath.join(rel_dir, name)
+            dirs.add(child)
+            pending.append(child)
+        files.update((posixpath.join(rel_dir, name), facts) for name, facts in entries.items())
+    return dirs, files, complete
+
+
+def _remote_path(remote_dir, rel):
+    if not rel:
+        return remote_dir
+    return rel if remote_dir in ('', '.') else posixpath.join(remote_dir, rel)
+
+
+def _with_parents(rel_dirs):
+    result = set()
+    for rel in rel_dirs:
+        while rel:
+            result.add(rel)
+            rel = posixpath.dirname(rel)
+    return sorted(result, key=lambda d: (d.count('/'), d))
+
+
+def sync_upload(
+    ftp,
+    local_dir,
+    remote_dir='.',
+    delete=False,
+    state_path=None,
+    pool=None,
+    workers=None,
+    retries=TRANSFER_RETRIES,
+    encryption_enabled=False,
+    key='',
+    progress_callback=None,
+):
+    """Send new or changed files of ``local_dir`` to ``remote_dir``.
+
+    A file is sent when it is missing on the server, when its local size or
+    mtime changed since the last run, or when the server copy no longer
+    matches the state index. Without an index entry the MLSD ``size`` and
+    ``modify`` facts are compared with ``os.stat``. Only directories holding
+    changed files are listed, unless ``delete`` is set: then the whole
+    remote tree is crawled and files and folders missing locally are removed.
+    """
+    try:
+        local_dirs, local_files = scan_local_tree(local_dir)
+        state = SyncState(state_path or os.path.join(local_dir, SYNC_STATE_FILE), remote_dir)
+
+        if delete:
+            # Só entradas efetivamente listadas são removidas, então uma
+            # listagem incompleta não apaga nada a mais
+            remote_dirs, remote_files, _ = walk_remote(ftp, remote_dir)
+            listed = remote_dirs | local_dirs | {''}
+            present = remote_dirs | {''}
+        else:
+            # Subárvores sem alterações locais não são listadas no servidor
+            listed = {
+                posixpath.dirname(rel)
+                for rel, stat in local_files.items()
+                if not state.local_matches(rel, stat)
+            }
+            remote_dirs, remote_files = set(), {}
+            present = set()
+            for rel_dir in listed:
+                listing = list_remote_dir(ftp, _remote_path(remote_dir, rel_dir))
+                if listing is None:
+                    continue
+                present.update(_with_parents([rel_dir]), [''])
+                subdirs, entries = listing
+                remote_dirs.update(posixpath.join(rel_dir, d) for d in subdirs)
+                remote_files.update((posixpath.join(rel_dir, n), f) for n, f in entries.items())
+
+        synced, to_send = {}, []
+        for rel, stat in sorted(local_files.items()):
+            facts = remote_files.get(rel)
+            if posixpath.dirname(rel) not in listed:
+                synced[rel] = state.files[rel]
+            elif facts is None:
+                to_send.append(rel)
+            elif rel in state.files:
+                if state.local_matches(rel, stat) and state.remote_matches(rel, facts):
+                    synced[rel] = state.files[rel]
+                else:
+                    to_send.append(rel)
+            else:
+                remote_time = parse_mlsd_time(facts.get('modify'))
+                if _remote_size(facts) == stat[0] and remote_time is not None and remote_time >= stat[1] / 1e9:
+                    synced[rel] = state.entry(stat, facts)
+                else:
+                    to_send.append(rel)
+
+        needed = {posixpath.dirname(rel) for rel in to_send} | (local_dirs - state.dirs)
+        if delete:
+            needed |= local_dirs - remote_dirs
+        present |= remote_dirs
+        new_dirs = [_remote_path(remote_dir, d) for d in _with_parents(needed) if d not in present]
+        if new_dirs and '' not in present and remote_dir.rstrip('/') not in ('', '.'):
+            new_dirs.insert(0, remote_dir.rstrip('/'))
+        ok = ensure_remote_dirs(ftp, new_dirs)
+
+        queue = TransferQueue(
+            pool or SingleSessionPool(ftp),
+            workers=workers,
+            order='fifo',
+            progress_callback=progress_callback,
+            retries=retries,
+            encryption_enabled=encryption_enabled,
+            key=key,
+        )
+        for rel in to_send:
+            queue.add(
+                upload_file,
+                os.path.join(local_dir, *rel.split('/')),
+                _remote_path(remote_dir, rel),
+                size=local_files[rel][0],
+                name=rel,
+            )
+        queue.run()
+
+        # Os fatos remotos dos arquivos enviados são relidos para o índice
+        sent = [rel for rel, done in queue.results if done]
+        for rel_dir in {posixpath.dirname(rel) for rel in sent}:
+            listing = list_remote_dir(ftp, _remote_path(remote_dir, rel_dir))
+            entries = listing[1] if listing else {}
+            for rel in sent:
+                name = posixpath.basename(rel)
+                if posixpath.dirname(rel) == rel_dir and name in entries:
+                    synced[rel] = state.entry(local_files[rel], entries[name])
+
+        removed = 0
+        if delete:
+            for rel in sorted(set(remote_files) - set(local_files)):
+                path = _remote_path(remote_dir, rel)
+                try:
+                    ftp.delete(path)
+                    remote_listing.invalidate_parent(ftp, path)
+                    removed += 1
+                except all_errors as e:
+                    logger.error('Erro ao remover arquivo remoto %s: %s', rel, e)
+                    ok = False
+            for rel in sorted(remote_dirs - local_dirs, key=lambda d: -d.count('/')):
+                path = _remote_path(remote_dir, rel)
+                try:
+                    ftp.rmd(path)
+                    remote_listing.invalidate_parent(ftp, path)
+                    remote_listing.invalidate(ftp, path)
+                    removed += 1
+                except all_errors as e:
+                    logger.error('Erro ao remover diretório remoto %s: %s', rel, e)
+                    ok = False
+
+        state.files = synced
+        state.dirs = local_dirs
+        state.save()
+        logger.info(
+            'Sincronização de %s -> %s: %d enviado(s), %d inalterado(s), %d removido(s), %d falha(s)',
+            local_dir, remote_dir, len(sent), len(synced) - len(sent), removed, len(queue.failed),
+        )
+        return ok and not queue.failed
+    except Exception as e:
+        logger.error('Erro durante sincronização de pasta: %s', e)
+        return False
+
+
+def sync_download(
+    ftp,
+    remote_dir,
+    local_dir,
+    delete=False,
+    state_path=None,
+    pool=None,
+    workers=None,
+    retries=TRANSFER_RETRIES,
+    encryption_enabled=False,
+    key='',
+    progress_callback=None,
+):
+    """Fetch new or changed files of ``remote_dir`` into ``local_dir``.
+
+    The remote tree is crawled once with MLSD. A file is fetched when it is
+    missing locally or when either side changed since the last run; without
+    an index entry the local size and mtime are compared with the MLSD
+    facts. Downloaded files get the server ``modify`` time as their mtime.
+    With ``delete`` local files and folders absent on the server are removed.
+    If any remote directory cannot be listed nothing is removed, the state
+    index is left untouched and False is returned.
+    """
+    try:
+        remote_dirs, remote_files, complete = walk_remote(ftp, remote_dir)
+        os.makedirs(local_dir, exist_ok=True)
+        local_dirs, local_files = scan_local_tree(local_dir)
+        state = SyncState(state_path or os.path.join(local_dir, SYNC_STATE_FILE), remote_dir)
+        for rel_dir in remote_dirs:
+            os.makedirs(os.path.join(local_dir, *rel_dir.split('/')), exist_ok=True)
+
+        synced, to_fetch = {}, []
+        for rel, facts in sorted(remote_files.items()):
+            stat = local_files.get(rel)
+            if stat is None:
+                to_fetch.append(rel)
+            elif rel in state.files:
+                if state.local_matches(rel, stat) and state.remote_matches(rel, facts):
+                    synced[rel] = state.files[rel]
+                else:
+                    to_fetch.append(rel)
+            else:
+                remote_time = parse_mlsd_time(facts.get('modify'))
+                if _remote_size(facts) == stat[0] and remote_time is not None and stat[1] / 1e9 >= remote_time:
+                    synced[rel] = state.entry(stat, facts)
+                else:
+                    to_fetch.append(rel)
+
+        queue = TransferQueue(
+            pool or SingleSessionPool(ftp),
+            workers=workers,
+            order='fifo',
+            progress_callback=progress_callback,
+            retries=retries,
+            encryption_enabled=encryption_enabled,
+            key=key,
+        )
+        for rel in to_fetch:
+            size = _remote_size(remote_files[rel])
+            queue.add(
+                functools.partial(download_file, remote_size=size),
+                _remote_path(remote_dir, rel),
+                os.path.join(local_dir, *posixpath.dirname(rel).split('/')),
+                size=size or 0,
+                name=rel,
+            )
+        queue.run()
+
+        fetched = [rel for rel, done in queue.results if done]
+        for rel in fetched:
+            facts = remote_files[rel]
+            local_file = os.path.join(local_dir, *rel.split('/'))
+            remote_time = parse_mlsd_time(facts.get('modify'))
+            if remote_time is not None:
+                os.utime(local_file, (remote_time, remote_time))
+            st = os.stat(local_file)
+            synced[rel] = state.entry((st.st_size, st.st_mtime_ns), facts)
+
+        ok = complete
+        removed = 0
+        if delete and not complete:
+            logger.error('Listagem remota de %s incompleta: nenhum arquivo local foi removido', remote_dir)
+        elif delete:
+            for rel in sorted(set(local_files) - set(remote_files)):
+                try:
+                    os.remove(os.path.join(local_dir, *rel.split('/')))
+                    removed += 1
+                except OSError as e:
+                    logger.error('Erro ao remover arquivo local %s: %s', rel, e)
+                    ok = False
+            for rel in sorted(local_dirs - remote_dirs, key=lambda d: -d.count('/')):
+                try:
+                    os.rmdir(os.path.join(local_dir, *rel.split('/')))
+                    removed += 1
+                except OSError as e:
+                    logger.error('Erro ao remover diretório local %s: %s', rel, e)
+                    ok = False
+
+        if complete:
+            state.files = synced
+            state.dirs = remote_dirs
+            state.save()
+        logger.info(
+            'Sincronização de %s -> %s: %d recebido(s), %d inalterado(s), %d removido(s), %d falha(s)',
+            remote_dir, local_dir, len(fetched), len(synced) - len(fetched), removed, len(queue.failed),
+        )
+        return ok and not queue.failed
+    except Exception as e:
+        logger.error('Erro durante sincronização de pasta: %s', e)
+        return False
@@ -0,0 +1,302 @@
+"""Client hot-path benchmark for FTP_Connection transfers.
+
+Starts FTP_server.py on localhost and runs the client's upload, download,
+segmented download and folder operations with and without client-side
+encryption. For each run it reports MB/s, per-chunk timing (from the
+progress callback) and the CPU time split between the XOR cipher, the
+progress callbacks and everything else (socket and disk I/O, ftplib).
+--profile writes cProfile stats for each run to a directory.
+
+Usage: python benchmarks/bench_client.py [--size 64M] [--files 32x256K]
+           [--operations upload,download,segmented,upload_dir,download_dir]
+           [--encryption both|on|off] [--profile profiles/] [--output client.json]
+"""
+import argparse
+import cProfile
+import json
+import logging
+import os
+import pstats
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from ftplib import FTP
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import FTP_Connection  # noqa: E402
+from FTP_cipher import EncryptingReader, XorCipher  # noqa: E402
+
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+OPERATIONS = ('upload', 'download', 'segmented', 'upload_dir', 'download_dir')
+KEY = 'bench-key'
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'servidor não respondeu na porta {port}')
+
+
+def write_config(work, port):
+    lines = [
+        '[FTP_SERVER]', 'FTP_HOST=127.0.0.1', f'FTP_PORT={port}', 'LOG_LEVEL=WARNING',
+        'MAX_CONNECTIONS_PER_IP=32',
+        '[USERS]',
+        'FTP_USER_MASTER=master', 'FTP_PASSWORD_MASTER=master', 'FTP_PERM_MASTER=elradfmw',
+        'FTP_USER_DEFAULT=bench', 'FTP_PASSWORD_DEFAULT=bench', 'FTP_PERM_DEFAULT=elradfmw',
+        '[PATH]', f"ALLOWED_PATH={os.path.join(work, 'root')}",
+        '[IP]', 'IP_WHITELIST=127.0.0.1', 'IP_BLACKLIST=192.0.2.1',
+    ]
+    with open(os.path.join(work, 'config.ini'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+class Probe:
+    """CPU time accumulated by instrumented code, summed over threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cipher = 0.0
+        self.callback = 0.0
+        self.chunks = []
+
+    def add(self, field, amount):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+
+def instrument(probe):
+    """Swap the cipher classes used by FTP_Connection for timed subclasses."""
+
+    class TimedXorCipher(XorCipher):
+        def process(self, data):
+            start = time.thread_time()
+            try:
+                return super().process(data)
+            finally:
+                probe.add('cipher', time.thread_time() - start)
+
+    class TimedEncryptingReader(EncryptingReader):
+        def __init__(self, file, key, position=0):
+            super().__init__(file, key, position)
+            self.cipher = TimedXorCipher(key, position)
+
+    saved = FTP_Connection.XorCipher, FTP_Connection.EncryptingReader
+    FTP_Connection.XorCipher = TimedXorCipher
+    FTP_Connection.EncryptingReader = TimedEncryptingReader
+    return saved
+
+
+def restore(saved):
+    FTP_Connection.XorCipher, FTP_Connection.EncryptingReader = saved
+
+
+def progress_callback(probe):
+    last = [time.perf_counter()]
+
+    def callback(done, total):
+        start = time.thread_time()
+        now = time.perf_counter()
+        with probe.lock:
+            probe.chunks.append(now - last[0])
+        last[0] = now
+        probe.add('callback', time.thread_time() - start)
+
+    return callback
+
+
+class Bench:
+    def __init__(self, work, port, size, files, file_size):
+        self.work = work
+        self.port = port
+        self.size = size
+        self.files = files
+        self.file_size = file_size
+        self.local = os.path.join(work, 'local')
+        self.source = os.path.join(self.local, 'data.bin')
+        self.tree = os.path.join(self.local, 'tree')
+        os.makedirs(self.tree)
+        with open(self.source, 'wb') as f:
+            for _ in range(0, size, UNITS['M']):
+                f.write(os.urandom(min(UNITS['M'], size - f.tell())))
+        for i in range(files):
+            sub = os.path.join(self.tree, f'd{i % 4}')
+            os.makedirs(sub, exist_ok=True)
+            with open(os.path.join(sub, f'f{i}.bin'), 'wb') as f:
+                f.write(os.urandom(file_size))
+        self.pool = FTP_Connection.FTPSessionPool('127.0.0.1', port, 'bench', 'bench', size=4)
+
+    def connect(self):
+        ftp = FTP()
+        ftp.connect('127.0.0.1', self.port)
+        ftp.login('bench', 'bench')
+        return ftp
+
+    def target(self, name):
+        path = os.path.join(self.local, name)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        return path
+
+    def prepare_remote(self, encrypted):
+        # Downloads partem do mesmo conteúdo que o upload gravaria no servidor
+        with self.connect() as ftp:
+            FTP_Connection.upload_file(ftp, self.source, 'data.bin', encrypted, KEY)
+            FTP_Connection.upload_directory(ftp, self.tree, 'tree', encrypted, KEY, pool=self.pool)
+
+    def run(self, operation, encrypted, callback):
+        with self.connect() as ftp:
+            if operation == 'upload':
+                ok = FTP_Connection.upload_file(ftp, self.source, 'upload.bin', encrypted, KEY, callback)
+                return ok, self.size
+            if operation == 'download':
+                ok = FTP_Connection.download_file(ftp, 'data.bin', self.target('download'), encrypted, KEY, callback)
+                return ok, self.size
+            if operation == 'segmented':
+                ok = FTP_Connection.download_file_segmented(
+                    ftp, 'data.bin', self.target('segmented'), encrypted, KEY, callback, pool=self.pool
+                )
+                return ok, self.size
+            if operation == 'upload_dir':
+                ok = FTP_Connection.upload_directory(
+                    ftp, self.tree, 'tree-up', encrypted, KEY, callback, pool=self.pool
+                )
+                return ok, self.files * self.file_size
+            ok = FTP_Connection.download_directory(
+                ftp, 'tree', self.target('download_dir'), encrypted, KEY, callback, pool=self.pool
+            )
+            return ok, self.files * self.file_size
+
+
+def measure(bench, operation, encrypted, profile_dir=None):
+    probe = Probe()
+    saved = instrument(probe)
+    profiler = cProfile.Profile() if profile_dir else None
+    try:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if profiler:
+            profiler.enable()
+        ok, nbytes = bench.run(operation, encrypted, progress_callback(probe))
+        if profiler:
+            profiler.disable()
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+    finally:
+        restore(saved)
+    label = f"{operation}{'-enc' if encrypted else ''}"
+    if profiler:
+        os.makedirs(profile_dir, exist_ok=True)
+        path = os.path.join(profile_dir, f'{label}.prof')
+        profiler.dump_stats(path)
+        print(f'\n== {label}: {path}')
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+    ms = 1000.0
+    return {
+        'operation': operation,
+        'encrypted': encrypted,
+        'ok': bool(ok),
+        'bytes': nbytes,
+        'wall_s': wall,
+        'mb_s': nbytes / UNITS['M'] / wall,
+        'cpu_s': cpu,
+        'cipher_cpu_s': probe.cipher,
+        'callback_cpu_s': probe.callback,
+        'other_cpu_s': max(0.0, cpu - probe.cipher - probe.callback),
+        'chunks': len(probe.chunks),
+        'chunk_p50_ms': (percentile(probe.chunks, 50) or 0) * ms,
+        'chunk_p99_ms': (percentile(probe.chunks, 99) or 0) * ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', default='64M', help='tamanho do arquivo único')
+    parser.add_argument('--files', default='32x256K', help='pasta de N arquivos de TAMANHO (NxTAMANHO)')
+    parser.add_argument('--operations', default=','.join(OPERATIONS), help='entre: ' + ', '.join(OPERATIONS))
+    parser.add_argument('--encryption', choices=('both', 'on', 'off'), default='both')
+    parser.add_argument('--profile', metavar='DIR', help='grava um .prof do cProfile por execução')
+    parser.add_argument('--output', help='salva o resultado em JSON')
+    args = parser.parse_args()
+    # Os logs INFO por arquivo do cliente poluiriam a tabela
+    logging.getLogger().setLevel(logging.WARNING)
+
+    count, _, file_size = args.files.lower().partition('x')
+    modes = {'both': (False, True), 'on': (True,), 'off': (False,)}[args.encryption]
+    operations = args.operations.split(',')
+    unknown = set(operations) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"operações desconhecidas: {', '.join(sorted(unknown))}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as work:
+        os.makedirs(os.path.join(work, 'root'))
+        port = free_port()
+        write_config(work, port)
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'FTP_server.py')],
+            cwd=work,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(port)
+            bench = Bench(work, port, parse_size(args.size), int(count), parse_size(file_size))
+            for encrypted in modes:
+                bench.prepare_remote(encrypted)
+                for operation in operations:
+                    results.append(measure(bench, operation, encrypted, args.profile))
+            bench.pool.close()
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(
+        f"{'run':>16} {'MB/s':>8} {'cpu s':>7} {'cipher':>7} {'callback':>8} {'other':>7}"
+        f" {'chunks':>7} {'p50 ms':>7} {'p99 ms':>7}"
+    )
+    for r in results:
+        label = f"{r['operation']}{'-enc' if r['encrypted'] else ''}" + ('' if r['ok'] else ' FALHOU')
+        print(
+            f"{label:>16} {r['mb_s']:8.1f} {r['cpu_s']:7.2f} {r['cipher_cpu_s']:7.2f} {r['callback_cpu_s']:8.3f}"
+            f" {r['other_cpu_s']:7.2f} {r['chunks']:7d} {r['chunk_p50_ms']:7.3f} {r['chunk_p99_ms']:7.3f}"
+        )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
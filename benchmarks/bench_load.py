@@ -0,0 +1,370 @@
+"""Load test of FTP_server.py with concurrent ftplib clients.
+
+Starts the real server in a temporary directory with its own config.ini and
+runs N client threads doing a weighted mix of STOR/RETR/LIST/MKD with file
+sizes drawn from a weighted distribution. Reports throughput, p50/p99
+latency per command, connections/s and server RSS, and saves everything as
+JSON so runs of different revisions can be compared with --compare.
+
+Usage: python benchmarks/bench_load.py [--clients 16] [--duration 10]
+           [--mix stor=40,retr=40,list=15,mkd=5] [--sizes 4K=50,256K=40,4M=10]
+           [--reconnect 50] [--set SERVER_MODE=threaded] [--output load.json]
+           [--compare previous.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from ftplib import FTP, all_errors
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+OPERATIONS = ('stor', 'retr', 'list', 'mkd')
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def parse_weights(text, convert=str):
+    """Parse ``a=3,b=1`` into ``{convert(a): 3.0, convert(b): 1.0}``."""
+    weights = {}
+    for item in text.split(','):
+        key, _, weight = item.partition('=')
+        weights[convert(key.strip())] = float(weight or 1)
+    return weights
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def write_config(work, port, clients, options):
+    server = {
+        'FTP_HOST': '127.0.0.1',
+        'FTP_PORT': str(port),
+        'LOG_LEVEL': 'WARNING',
+        'MAX_CONNECTIONS': str(clients * 2 + 16),
+        'MAX_CONNECTIONS_PER_IP': str(clients * 2 + 16),
+    }
+    server.update(options)
+    lines = ['[FTP_SERVER]'] + [f'{key}={value}' for key, value in server.items()]
+    lines += [
+        '[USERS]',
+        'FTP_USER_MASTER=master', 'FTP_PASSWORD_MASTER=master', 'FTP_PERM_MASTER=elradfmw',
+        'FTP_USER_DEFAULT=bench', 'FTP_PASSWORD_DEFAULT=bench', 'FTP_PERM_DEFAULT=elradfmw',
+        '[PATH]', f"ALLOWED_PATH={os.path.join(work, 'root')}",
+        '[IP]', 'IP_WHITELIST=127.0.0.1', 'IP_BLACKLIST=192.0.2.1',
+    ]
+    with open(os.path.join(work, 'config.ini'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'servidor não respondeu na porta {port}')
+
+
+def process_rss(pid):
+    """RSS in bytes of ``pid`` plus its child processes (Linux only)."""
+    total = 0
+    try:
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                if int(entry) != pid and ppid != pid:
+                    continue
+                with open(f'/proc/{entry}/statm') as f:
+                    total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+            except (OSError, ValueError, IndexError):
+                continue
+    except OSError:
+        return None
+    return total
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            rss = process_rss(self.pid)
+            if rss is not None:
+                self.samples.append(rss)
+
+
+class LoadClient(threading.Thread):
+    """One simulated user: reconnects every ``reconnect`` operations."""
+
+    def __init__(self, index, port, deadline, mix, sizes, seeds, reconnect, payload):
+        super().__init__(daemon=True)
+        self.index = index
+        self.port = port
+        self.deadline = deadline
+        self.random = random.Random(index)
+        self.mix = mix
+        self.sizes = sizes
+        self.seeds = seeds
+        self.reconnect = reconnect
+        self.payload = payload
+        self.latencies = {op: [] for op in OPERATIONS + ('connect',)}
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.errors = 0
+        self.counter = 0
+
+    def connect(self):
+        start = time.perf_counter()
+        ftp = FTP()
+        ftp.connect('127.0.0.1', self.port, timeout=30)
+        ftp.login('bench', 'bench')
+        ftp.voidcmd('TYPE I')
+        self.latencies['connect'].append(time.perf_counter() - start)
+        return ftp
+
+    def run(self):
+        ops, op_weights = zip(*self.mix.items())
+        sizes, size_weights = zip(*self.sizes.items())
+        ftp = None
+        done_on_connection = 0
+        while time.monotonic() < self.deadline:
+            try:
+                if ftp is None or (self.reconnect and done_on_connection >= self.reconnect):
+                    if ftp is not None:
+                        ftp.quit()
+                    ftp = self.connect()
+                    done_on_connection = 0
+                op = self.random.choices(ops, op_weights)[0]
+                size = self.random.choices(sizes, size_weights)[0]
+                start = time.perf_counter()
+                getattr(self, op)(ftp, size)
+                self.latencies[op].append(time.perf_counter() - start)
+                done_on_connection += 1
+            except all_errors:
+                self.errors += 1
+                ftp = None
+        if ftp is not None:
+            try:
+                ftp.quit()
+            except all_errors:
+                pass
+
+    def next_name(self, prefix):
+        self.counter += 1
+        return f'{prefix}-{self.index}-{self.counter}'
+
+    def stor(self, ftp, size):
+        ftp.storbinary(f"STOR {self.next_name('up')}", io.BytesIO(self.payload[:size]), blocksize=256 * 1024)
+        self.bytes_up += size
+
+    def retr(self, ftp, size):
+        received = 0
+
+        def sink(data):
+            nonlocal received
+            received += len(data)
+
+        ftp.retrbinary(f'RETR {self.seeds[size]}', sink, blocksize=256 * 1024)
+        self.bytes_down += received
+
+    def list(self, ftp, size):
+        ftp.retrlines('LIST', lambda line: None)
+
+    def mkd(self, ftp, size):
+        ftp.mkd(self.next_name('dir'))
+
+
+def seed_files(root, sizes):
+    seeds = {}
+    for size in sizes:
+        name = f'seed-{size}.bin'
+        with open(os.path.join(root, name), 'wb') as f:
+            f.write(os.urandom(size))
+        seeds[size] = name
+    return seeds
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(clients, elapsed, rss_samples):
+    ms = 1000.0
+    commands = {}
+    for op in OPERATIONS + ('connect',):
+        values = [v for client in clients for v in client.latencies[op]]
+        if not values:
+            continue
+        commands[op] = {
+            'count': len(values),
+            'per_second': len(values) / elapsed,
+            'p50_ms': percentile(values, 50) * ms,
+            'p99_ms': percentile(values, 99) * ms,
+            'max_ms': max(values) * ms,
+        }
+    bytes_up = sum(client.bytes_up for client in clients)
+    bytes_down = sum(client.bytes_down for client in clients)
+    return {
+        'elapsed_s': elapsed,
+        'operations': sum(commands[op]['count'] for op in commands if op != 'connect'),
+        'operations_per_second': sum(commands[op]['per_second'] for op in commands if op != 'connect'),
+        'errors': sum(client.errors for client in clients),
+        'upload_mb_s': bytes_up / UNITS['M'] / elapsed,
+        'download_mb_s': bytes_down / UNITS['M'] / elapsed,
+        'connections_per_second': commands.get('connect', {}).get('per_second', 0.0),
+        'rss_peak_mb': max(rss_samples) / UNITS['M'] if rss_samples else None,
+        'rss_mean_mb': sum(rss_samples) / len(rss_samples) / UNITS['M'] if rss_samples else None,
+        'commands': commands,
+    }
+
+
+def run(args):
+    mix = parse_weights(args.mix)
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"operações desconhecidas: {', '.join(sorted(unknown))}")
+    sizes = parse_weights(args.sizes, parse_size)
+    options = dict(item.split('=', 1) for item in args.set)
+
+    with tempfile.TemporaryDirectory() as work:
+        root = os.path.join(work, 'root')
+        os.makedirs(root)
+        seeds = seed_files(root, sizes)
+        payload = os.urandom(max(sizes))
+        port = free_port()
+        write_config(work, port, args.clients, options)
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'FTP_server.py')],
+            cwd=work,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        sampler = RssSampler(server.pid)
+        try:
+            wait_for_port(port)
+            sampler.start()
+            start = time.monotonic()
+            deadline = start + args.duration
+            clients = [
+                LoadClient(i, port, deadline, mix, sizes, seeds, args.reconnect, payload)
+                for i in range(args.clients)
+            ]
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            elapsed = time.monotonic() - start
+        finally:
+            sampler.stopped.set()
+            server.terminate()
+            server.wait()
+
+    return {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {
+            'clients': args.clients,
+            'duration': args.duration,
+            'mix': mix,
+            'sizes': {str(size): weight for size, weight in sizes.items()},
+            'reconnect': args.reconnect,
+            'server': options,
+        },
+        'results': summarize(clients, elapsed, sampler.samples),
+    }
+
+
+def print_report(report, previous=None):
+    results = report['results']
+    old = previous['results'] if previous else {}
+
+    def delta(value, before):
+        if before in (None, 0) or value is None:
+            return ''
+        return f' ({(value - before) / before * 100:+.1f}%)'
+
+    print(f"Revisão {report['revision']}, {report['settings']['clients']} clientes, {results['elapsed_s']:.1f}s")
+    for key in (
+        'operations_per_second', 'upload_mb_s', 'download_mb_s',
+        'connections_per_second', 'rss_peak_mb', 'errors',
+    ):
+        value = results[key]
+        shown = 'n/a' if value is None else f'{value:.1f}' if isinstance(value, float) else str(value)
+        print(f'{key:>24} {shown:>10}{delta(value, old.get(key))}')
+    print(f"{'command':>10} {'count':>8} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    old_commands = old.get('commands', {})
+    for op, stats in results['commands'].items():
+        before = old_commands.get(op, {})
+        print(
+            f"{op:>10} {stats['count']:>8} {stats['per_second']:9.1f} {stats['p50_ms']:9.2f} "
+            f"{stats['p99_ms']:9.2f}{delta(stats['p99_ms'], before.get('p99_ms'))}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='segundos de carga')
+    parser.add_argument('--mix', default='stor=40,retr=40,list=15,mkd=5', help='pesos de ' + ', '.join(OPERATIONS))
+    parser.add_argument('--sizes', default='4K=50,256K=40,4M=10', help='tamanho=peso dos arquivos')
+    parser.add_argument('--reconnect', type=int, default=50, help='operações por conexão (0 = nunca reconecta)')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help='chave de [FTP_SERVER]')
+    parser.add_argument('--output', help='salva o resultado em JSON')
+    parser.add_argument('--compare', help='JSON de uma execução anterior')
+    args = parser.parse_args()
+
+    report = run(args)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark of FTP_server.PathJail against the original check_path.
+
+Usage: python benchmarks/bench_path_jail.py [--checks 100000] [--dirs 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from FTP_server import PathJail  # noqa: E402
+
+
+def legacy_check_path(path, allowed_path):
+    return os.path.abspath(path).startswith(os.path.abspath(allowed_path))
+
+
+def measure(func, paths):
+    start = time.perf_counter()
+    for path in paths:
+        func(path)
+    return len(paths) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--checks', type=int, default=100000)
+    parser.add_argument('--dirs', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        dirs = [os.path.join(root, f'dir{i}') for i in range(args.dirs)]
+        for directory in dirs:
+            os.makedirs(directory)
+        paths = [
+            os.path.join(dirs[i % len(dirs)], f'file{i}.bin')
+            for i in range(args.checks)
+        ]
+        legacy = measure(lambda p: legacy_check_path(p, root), paths)
+        jail = PathJail(root)
+        cold = measure(jail.contains, paths)
+        warm = measure(jail.contains, paths)
+
+    print(f'{args.checks} checks over {args.dirs} directories')
+    print(f'legacy abspath/startswith: {legacy:12,.0f} checks/s')
+    print(f'PathJail (cold cache):     {cold:12,.0f} checks/s')
+    print(f'PathJail (warm cache):     {warm:12,.0f} checks/s')
+
+
+if __name__ == '__main__':
+    main()
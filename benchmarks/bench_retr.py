@@ -0,0 +1,130 @@
+"""RETR throughput of FTP_server.py for each data channel setting.
+
+Each setting starts the real server in a temporary directory with its own
+config.ini and downloads the same file over loopback with ftplib.
+
+Usage: python benchmarks/bench_retr.py [--size 256M] [--repeat 3]
+                                       [--settings sendfile,send-64K,send-1M]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from ftplib import FTP
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+# Chaves de [FTP_SERVER] aplicadas por cada configuração
+SETTINGS = {
+    'sendfile': {'USE_SENDFILE': 'True'},
+    'sendfile-1M': {'USE_SENDFILE': 'True', 'DTP_CHUNK_SIZE': '1048576'},
+    'send-64K': {'USE_SENDFILE': 'False', 'DTP_CHUNK_SIZE': '65536'},
+    'send-256K': {'USE_SENDFILE': 'False', 'DTP_CHUNK_SIZE': '262144'},
+    'send-1M': {'USE_SENDFILE': 'False', 'DTP_CHUNK_SIZE': '1048576'},
+    'send-1M-sndbuf4M': {'USE_SENDFILE': 'False', 'DTP_CHUNK_SIZE': '1048576', 'SOCKET_SNDBUF': '4194304'},
+    'encrypted-1M': {'DTP_CHUNK_SIZE': '1048576', 'ENCRYPT_AT_REST': 'True', 'ENCRYPT_AT_REST_KEY': 'bench'},
+}
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def write_config(work, port, options):
+    lines = ['[FTP_SERVER]', 'FTP_HOST=127.0.0.1', f'FTP_PORT={port}', 'LOG_LEVEL=WARNING']
+    lines += [f'{key}={value}' for key, value in options.items()]
+    lines += [
+        '[USERS]',
+        'FTP_USER_MASTER=master', 'FTP_PASSWORD_MASTER=master', 'FTP_PERM_MASTER=elradfmw',
+        'FTP_USER_DEFAULT=bench', 'FTP_PASSWORD_DEFAULT=bench', 'FTP_PERM_DEFAULT=elr',
+        '[PATH]', f"ALLOWED_PATH={os.path.join(work, 'root')}",
+        '[IP]', 'IP_WHITELIST=127.0.0.1', 'IP_BLACKLIST=192.0.2.1',
+    ]
+    with open(os.path.join(work, 'config.ini'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'servidor não respondeu na porta {port}')
+
+
+def measure(port, size, repeat):
+    ftp = FTP()
+    ftp.connect('127.0.0.1', port)
+    ftp.login('bench', 'bench')
+    best = 0.0
+    for _ in range(repeat):
+        received = 0
+
+        def sink(data):
+            nonlocal received
+            received += len(data)
+
+        start = time.perf_counter()
+        ftp.retrbinary('RETR data.bin', sink, blocksize=256 * 1024)
+        elapsed = time.perf_counter() - start
+        if received != size:
+            raise RuntimeError(f'recebidos {received} de {size} bytes')
+        best = max(best, size / UNITS['M'] / elapsed)
+    ftp.quit()
+    return best
+
+
+def run_setting(name, size, repeat):
+    with tempfile.TemporaryDirectory() as work:
+        os.makedirs(os.path.join(work, 'root'))
+        with open(os.path.join(work, 'root', 'data.bin'), 'wb') as f:
+            for _ in range(0, size, UNITS['M']):
+                f.write(os.urandom(min(UNITS['M'], size - f.tell())))
+        port = free_port()
+        write_config(work, port, SETTINGS[name])
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'FTP_server.py')],
+            cwd=work,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(port)
+            return measure(port, size, repeat)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', default='256M')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--settings', default=','.join(SETTINGS), help='entre: ' + ', '.join(SETTINGS))
+    args = parser.parse_args()
+
+    size = parse_size(args.size)
+    print(f'RETR de {args.size} via loopback, melhor de {args.repeat}')
+    print(f"{'setting':>18} {'MB/s':>10}")
+    for name in args.settings.split(','):
+        print(f'{name:>18} {run_setting(name, size, args.repeat):10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Micro-benchmark comparing the legacy per-byte XOR with FTP_cipher.XorCipher.
+
+Usage: python benchmarks/bench_xor_cipher.py [--sizes 1M,16M,128M,1G]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import FTP_cipher  # noqa: E402
+from FTP_cipher import XorCipher  # noqa: E402
+
+CHUNK_SIZE = 1024 * 1024
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def legacy_xor_cipher(data, key):
+    """Original implementation: one byte at a time in a generator."""
+    key_bytes = key.encode('utf-8')
+    return bytes(b ^ key_bytes[i % len(key_bytes)] for i, b in enumerate(data))
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def run_legacy(total, key, chunk):
+    start = time.perf_counter()
+    done = 0
+    while done < total:
+        legacy_xor_cipher(chunk[:min(len(chunk), total - done)], key)
+        done += len(chunk)
+    return time.perf_counter() - start
+
+
+def run_streaming(total, key, chunk):
+    cipher = XorCipher(key)
+    start = time.perf_counter()
+    done = 0
+    while done < total:
+        cipher.process(chunk[:min(len(chunk), total - done)])
+        done += len(chunk)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1M,16M,128M,1G')
+    parser.add_argument('--key', default='benchmark-key')
+    parser.add_argument(
+        '--legacy-max',
+        default='16M',
+        help='maior entrada medida com a implementação antiga (muito lenta)',
+    )
+    args = parser.parse_args()
+
+    legacy_max = parse_size(args.legacy_max)
+    chunk = os.urandom(CHUNK_SIZE)
+    backend = 'numpy' if FTP_cipher.np is not None else 'int.from_bytes'
+    print(f'backend: {backend}, chunk: {CHUNK_SIZE} bytes')
+    print(f"{'size':>10} {'legacy MB/s':>12} {'stream MB/s':>12} {'speedup':>9}")
+    for text in args.sizes.split(','):
+        total = parse_size(text)
+        mb = total / UNITS['M']
+        new = mb / run_streaming(total, args.key, chunk)
+        if total <= legacy_max:
+            old = mb / run_legacy(total, args.key, chunk)
+            print(f'{text:>10} {old:12.1f} {new:12.1f} {new / old:8.0f}x')
+        else:
+            print(f"{text:>10} {'skipped':>12} {new:12.1f} {'-':>9}")
+
+
+if __name__ == '__main__':
+    main()
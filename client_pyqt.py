@@ -1,16 +1,18 @@
 # PyQt5 interface for SimpleFTPServer client
+import functools
 import os
-import threading
-from ftplib import FTP
-from PyQt5 import QtWidgets
+from PyQt5 import QtCore, QtWidgets
 
 from FTP_Connection import (
     upload_file,
-    download_file,
-    upload_directory,
-    download_directory,
-    list_files,
-    load_ftp_config,
+    download_file_segmented,
+    list_file_sizes,
+    get_session_pool,
+    load_transfer_config,
+    TransferQueue,
+    TRANSFER_RETRIES,
+    queue_directory_upload,
+    queue_directory_download,
     first_time_tutorial,
 )
 
@@ -42,50 +44,55 @@ def main():
             self.btn_down_dir.clicked.connect(self.download_dir)
 
         def connect_ftp(self):
-            host, port, user, password, enc, key = load_ftp_config()
-            ftp = FTP()
-            ftp.connect(host, port)
-            ftp.login(user, password)
-            return ftp, enc, key
-
-        def run_with_progress(self, title, func, *args):
-            progress = QtWidgets.QProgressDialog(title, 'Cancelar', 0, 100, self)
+            """Borrow a logged-in session from the shared pool."""
+            return get_session_pool().session()
+
+        def run_queue(self, title, queue):
+            total_jobs = queue.pending
+            progress = QtWidgets.QProgressDialog(title, 'Cancelar', 0, 1000, self)
             progress.setWindowTitle(title)
-            progress.setAutoClose(True)
+            progress.setAutoClose(False)
+            progress.canceled.connect(queue.cancel)
             progress.show()
+            queue.start()
 
-            def update(curr, total):
-                progress.setMaximum(total if total else 1)
-                progress.setValue(curr)
+            # A fila roda em threads; a janela é atualizada pelo timer da GUI
+            timer = QtCore.QTimer(self)
 
-            def work():
-                try:
-                    ftp, enc, key = self.connect_ftp()
-                    func(
-                        ftp,
-                        *args,
-                        encryption_enabled=enc,
-                        key=key,
-                        progress_callback=update,
+            def refresh():
+                done = queue.bytes_done * 1000 // (queue.bytes_total or 1)
+                progress.setValue(min(done, 1000))
+                progress.setLabelText(
+                    f'{title}: {queue.completed}/{total_jobs} arquivos - '
+                    f'{queue.throughput / (1024 * 1024):.1f} MB/s'
+                )
+                if queue.completed < total_jobs:
+                    return
+                timer.stop()
+                # close() emite canceled; a fila já terminou e não deve ser cancelada
+                progress.canceled.disconnect(queue.cancel)
+                progress.close()
+                if queue.failed and not queue.cancelled:
+                    QtWidgets.QMessageBox.critical(
+                        self, 'Erro', f'Falha em {len(queue.failed)} arquivo(s)'
                     )
-                except Exception as e:
-                    QtWidgets.QMessageBox.critical(self, 'Erro', str(e))
-                finally:
-                    try:
-                        ftp.quit()
-                    except Exception:
-                        pass
-                    progress.close()
 
-            threading.Thread(target=work).start()
+            timer.timeout.connect(refresh)
+            timer.start(200)
 
         def upload_files(self):
             paths, _ = QtWidgets.QFileDialog.getOpenFileNames(
                 self, 'Selecione os arquivos'
             )
+            if not paths:
+                return
+            queue = TransferQueue(
+                get_session_pool(), order=load_transfer_config(), retries=TRANSFER_RETRIES
+            )
             for path in paths:
                 name = os.path.basename(path)
-                self.run_with_progress(f'Upload {name}', upload_file, path, name)
+                queue.add(upload_file, path, name, size=os.path.getsize(path), name=name)
+            self.run_queue('Upload', queue)
 
         def upload_dir(self):
             directory = QtWidgets.QFileDialog.getExistingDirectory(
@@ -95,41 +102,62 @@ def main():
                 remote, ok = QtWidgets.QInputDialog.getText(
                     self, 'Destino', 'Pasta no servidor:', text='.'
                 )
-                if ok:
-                    self.run_with_progress(
-                        'Upload de Pasta', upload_directory, directory, remote
-                    )
+                if not ok:
+                    return
+                pool = get_session_pool()
+                try:
+                    with self.connect_ftp() as ftp:
+                        queue = queue_directory_upload(ftp, directory, remote, pool)
+                except Exception as e:
+                    QtWidgets.QMessageBox.critical(self, 'Erro', str(e))
+                    return
+                if queue is None:
+                    QtWidgets.QMessageBox.critical(self, 'Erro', 'Pasta inválida')
+                    return
+                self.run_queue('Upload de Pasta', queue)
 
         def download_files(self):
             try:
-                ftp, enc, key = self.connect_ftp()
-                files = list_files(ftp)
+                with self.connect_ftp() as ftp:
+                    sizes = list_file_sizes(ftp)
             except Exception as e:
                 QtWidgets.QMessageBox.critical(self, 'Erro', str(e))
                 return
+            files = list(sizes or ())
             if not files:
                 QtWidgets.QMessageBox.critical(self, 'Erro', 'Nenhum arquivo disponível')
                 return
             dialog = QtWidgets.QDialog(self)
             dialog.setWindowTitle('Selecionar Arquivos')
             vbox = QtWidgets.QVBoxLayout(dialog)
-            listw = QtWidgets.QListWidget()
-            listw.addItems(files)
+            # QListView com modelo só desenha as linhas visíveis
+            listw = QtWidgets.QListView()
+            listw.setModel(QtCore.QStringListModel(files, listw))
+            listw.setUniformItemSizes(True)
+            listw.setLayoutMode(QtWidgets.QListView.Batched)
             listw.setSelectionMode(QtWidgets.QAbstractItemView.MultiSelection)
             vbox.addWidget(listw)
+            vbox.addWidget(QtWidgets.QLabel(f'{len(files)} arquivo(s)'))
             btn = QtWidgets.QPushButton('OK')
             vbox.addWidget(btn)
             btn.clicked.connect(dialog.accept)
             if not dialog.exec_():
-                ftp.quit()
                 return
-            choices = [item.text() for item in listw.selectedItems()]
+            choices = [files[index.row()] for index in listw.selectionModel().selectedRows()]
             save = QtWidgets.QFileDialog.getExistingDirectory(self, 'Salvar em')
-            ftp.quit()
             if not save or not choices:
                 return
+            pool = get_session_pool()
+            queue = TransferQueue(pool, order=load_transfer_config(), retries=TRANSFER_RETRIES)
+            # Arquivos grandes usam as sessões livres do pool em faixas paralelas
+            segmented = functools.partial(download_file_segmented, pool=pool)
             for c in choices:
-                self.run_with_progress(f'Download {c}', download_file, c, save)
+                # O tamanho do MLSD ordena a fila e dispensa o SIZE
+                queue.add(
+                    functools.partial(segmented, remote_size=sizes[c]), c, save,
+                    size=sizes[c] or 0, name=c,
+                )
+            self.run_queue('Download', queue)
 
         def download_dir(self):
             remote, ok = QtWidgets.QInputDialog.getText(
@@ -140,7 +168,14 @@ def main():
             local = QtWidgets.QFileDialog.getExistingDirectory(self, 'Salvar em')
             if not local:
                 return
-            self.run_with_progress('Download de Pasta', download_directory, remote, local)
+            pool = get_session_pool()
+            try:
+                with self.connect_ftp() as ftp:
+                    queue = queue_directory_download(ftp, remote, local, pool)
+            except Exception as e:
+                QtWidgets.QMessageBox.critical(self, 'Erro', str(e))
+                return
+            self.run_queue('Download de Pasta', queue)
 
     app = QtWidgets.QApplication([])
     win = MainWindow()
@@ -0,0 +1,173 @@
+import os
+import sys
+# Ensure module import from repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import types
+
+import pytest
+
+# Provide dummy pyftpdlib modules so FTP_server can be imported without the
+# real dependency installed.
+sys.modules.setdefault('pyftpdlib.authorizers', types.SimpleNamespace(DummyAuthorizer=object))
+sys.modules.setdefault('pyftpdlib.exceptions', types.SimpleNamespace(AuthenticationFailed=Exception))
+sys.modules.setdefault('pyftpdlib.filesystems', types.SimpleNamespace(AbstractedFS=object))
+sys.modules.setdefault('pyftpdlib.handlers', types.SimpleNamespace(
+    FTPHandler=object,
+    TLS_FTPHandler=object,
+))
+sys.modules.setdefault('pyftpdlib.servers', types.SimpleNamespace(
+    FTPServer=object,
+    ThreadedFTPServer=object,
+    MultiprocessFTPServer=object,
+))
+
+
+class FakeFTP:
+    def __init__(self):
+        self.stored = {}
+        self.files = {}
+        self.dirs = {'/'}
+
+    def storbinary(self, cmd, file, blocksize=8192, callback=None, rest=None):
+        filename = cmd.split()[1]
+        chunks = [self.files.get(filename, b'')[:rest]] if rest else []
+        while True:
+            buf = file.read(blocksize)
+            if not buf:
+                break
+            chunks.append(buf)
+            if callback:
+                callback(buf)
+        self.stored[filename] = self.files[filename] = b''.join(chunks)
+
+    def retrbinary(self, cmd, callback, blocksize=8192, rest=None):
+        filename = cmd.split()[1]
+        data = self.files.get(filename)
+        if data is None:
+            raise Exception('missing file')
+        for i in range(rest or 0, len(data), blocksize):
+            callback(data[i:i + blocksize])
+
+    def nlst(self, path=None):
+        path = path or '/'
+        prefix = path.rstrip('/') + '/'
+        result = []
+        for p in self.dirs:
+            if p.startswith(prefix) and p != prefix.rstrip('/'):
+                name = p[len(prefix):].split('/')[0]
+                if name not in result:
+                    result.append(name)
+        for f in self.files:
+            if f.startswith(prefix):
+                name = f[len(prefix):].split('/')[0]
+                if name not in result:
+                    result.append(name)
+        return result
+
+    def mkd(self, path):
+        self.dirs.add(path)
+
+    def voidcmd(self, cmd):
+        return '200 OK'
+
+    def rename(self, src, dst):
+        for store in (self.stored, self.files):
+            if src in store:
+                store[dst] = store.pop(src)
+
+    def delete(self, path):
+        self.stored.pop(path, None)
+        self.files.pop(path, None)
+
+    def mlsd(self, path, facts=None):
+        prefix = path.rstrip('/') + '/' if path != '.' else ''
+        seen = set()
+        for p in sorted(self.dirs.union(self.files)):
+            if p.startswith(prefix) and p != prefix.rstrip('/'):
+                name = p[len(prefix):].split('/')[0]
+                full = prefix + name
+                if name in seen:
+                    continue
+                seen.add(name)
+                if full in self.dirs:
+                    yield name, {'type': 'dir'}
+                elif full in self.files:
+                    yield name, {'type': 'file', 'size': str(len(self.files[full])), 'modify': '20240101000000'}
+
+    def size(self, filename):
+        self.size_calls = getattr(self, 'size_calls', 0) + 1
+        data = self.files.get(filename)
+        return len(data) if data is not None else 0
+
+
+class FakeSession:
+    """A pooled connection; transfers go to the ``shared`` FakeFTP."""
+
+    shared = None
+
+    def __init__(self):
+        self.alive = True
+        self.noops = 0
+
+    def connect(self, host, port):
+        self.address = (host, port)
+
+    def login(self, user, password):
+        self.user = user
+
+    def voidcmd(self, cmd):
+        self.noops += 1
+        if not self.alive:
+            raise EOFError('connection lost')
+        return '200 NOOP ok'
+
+    def quit(self):
+        self.alive = False
+
+    def storbinary(self, *args, **kwargs):
+        return self.shared.storbinary(*args, **kwargs)
+
+    def retrbinary(self, *args, **kwargs):
+        return self.shared.retrbinary(*args, **kwargs)
+
+    def size(self, filename):
+        return self.shared.size(filename)
+
+
+class SessionPoolFactory:
+    """Builds FTPSessionPool objects whose sessions are FakeSession objects.
+
+    Keyword arguments other than the pool options become attributes of the
+    session class, so a test only overrides the commands it exercises.
+    Every session opened by the pools is recorded in ``sessions``.
+    """
+
+    def __init__(self):
+        self.sessions = []
+
+    def __call__(self, size=1, shared=None, health_check_interval=15.0, **attrs):
+        # Importado aqui e não no carregamento do conftest: o log do cliente
+        # prende seu StreamHandler ao stderr vigente, que o pytest fecha ao sair
+        import FTP_Connection
+
+        session_class = type('Session', (FakeSession,), dict(attrs, shared=shared))
+
+        def factory():
+            session = session_class()
+            self.sessions.append(session)
+            return session
+
+        return FTP_Connection.FTPSessionPool(
+            'h', 21, 'u', 'p', size=size, health_check_interval=health_check_interval, factory=factory
+        )
+
+
+@pytest.fixture
+def fake_ftp():
+    return FakeFTP()
+
+
+@pytest.fixture
+def session_pool():
+    return SessionPoolFactory()
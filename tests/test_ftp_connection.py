@@ -1,78 +1,13 @@
 import os
-import sys
-# Ensure module import from repository root
-sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-
-import types
+import time
 from configparser import ConfigParser
+from ftplib import error_perm
 
-# Provide dummy pyftpdlib modules so FTP_server can be imported without the
-# real dependency installed.
-sys.modules.setdefault('pyftpdlib.authorizers', types.SimpleNamespace(DummyAuthorizer=object))
-sys.modules.setdefault('pyftpdlib.handlers', types.SimpleNamespace(
-    FTPHandler=object,
-    TLS_FTPHandler=object,
-))
-sys.modules.setdefault('pyftpdlib.servers', types.SimpleNamespace(FTPServer=object))
+import pytest
 
 import FTP_Connection
 import FTP_server
 
-class FakeFTP:
-    def __init__(self):
-        self.stored = {}
-        self.files = {}
-        self.dirs = {'/'}
-
-    def storbinary(self, cmd, file, callback=None):
-        filename = cmd.split()[1]
-        data = file.read()
-        self.stored[filename] = data
-        if callback:
-            callback(data)
-
-    def retrbinary(self, cmd, callback, blocksize=8192, rest=None):
-        filename = cmd.split()[1]
-        data = self.files.get(filename)
-        if data is None:
-            raise Exception('missing file')
-        callback(data)
-
-    def nlst(self, path=None):
-        path = path or '/'
-        prefix = path.rstrip('/') + '/'
-        result = []
-        for p in self.dirs:
-            if p.startswith(prefix) and p != prefix.rstrip('/'):
-                name = p[len(prefix):].split('/')[0]
-                if name not in result:
-                    result.append(name)
-        for f in self.files:
-            if f.startswith(prefix):
-                name = f[len(prefix):].split('/')[0]
-                if name not in result:
-                    result.append(name)
-        return result
-
-    def mkd(self, path):
-        self.dirs.add(path)
-
-    def mlsd(self, path, facts=None):
-        prefix = path.rstrip('/') if path != '.' else ''
-        if prefix:
-            prefix += '/'
-        for p in sorted(self.dirs.union(self.files)):
-            if p.startswith(prefix) and p != prefix.rstrip('/'):
-                name = p[len(prefix):].split('/')[0]
-                full = prefix + name
-                if full in self.dirs:
-                    yield name, {'type': 'dir'}
-                elif full in self.files:
-                    yield name, {'type': 'file'}
-
-    def size(self, filename):
-        data = self.files.get(filename)
-        return len(data) if data is not None else 0
 
 def test_load_config(tmp_path):
     cfg = tmp_path / 'config.ini'
@@ -85,6 +20,8 @@ def test_load_config(tmp_path):
                     'LOG_LEVEL=DEBUG\n'
                     'ENCRYPTION_ENABLED=True\n'
                     'ENCRYPTION_KEY=mykey\n'
+                    'ENCRYPT_AT_REST=True\n'
+                    'ENCRYPT_AT_REST_KEY=diskkey\n'
                     '[USERS]\nFTP_USER_MASTER=master\n'
                     'FTP_PASSWORD_MASTER=pass\n'
                     'FTP_PERM_MASTER=elradfmw\nFTP_USER_DEFAULT=guest\n'
@@ -108,22 +45,27 @@ def test_load_config(tmp_path):
     assert result[17] == 'DEBUG'
     assert result[18] is True
     assert result[19] == 'mykey'
+    assert result[20] == 'async'
+    assert result[21] == 0
+    assert result[22] == ''
+    assert result[24] == 300
+    assert result[28] is True
+    assert result[31] == 65536
+    assert result[49:51] == (True, 'diskkey')
 
 
-def test_upload_file(tmp_path):
-    fake = FakeFTP()
+def test_upload_file(fake_ftp, tmp_path):
     src = tmp_path / 'src.txt'
     src.write_text('data')
-    assert FTP_Connection.upload_file(fake, str(src), 'dest.txt', True, 'k', lambda *a: None)
+    assert FTP_Connection.upload_file(fake_ftp, str(src), 'dest.txt', True, 'k', lambda *a: None)
     expected = FTP_Connection.xor_cipher(b'data', 'k')
-    assert fake.stored['dest.txt'] == expected
+    assert fake_ftp.stored['dest.txt'] == expected
 
 
-def test_download_file(tmp_path):
-    fake = FakeFTP()
+def test_download_file(fake_ftp, tmp_path):
     encrypted = FTP_Connection.xor_cipher(b'download-data', 'k')
-    fake.files['src.txt'] = encrypted
-    assert FTP_Connection.download_file(fake, 'src.txt', str(tmp_path), True, 'k', lambda *a: None)
+    fake_ftp.files['src.txt'] = encrypted
+    assert FTP_Connection.download_file(fake_ftp, 'src.txt', str(tmp_path), True, 'k', lambda *a: None)
     output = (tmp_path / 'src.txt').read_bytes()
     assert output == b'download-data'
 
@@ -160,24 +102,340 @@ def test_create_config_interactively(monkeypatch, tmp_path):
     assert cfg.get('USERS', 'FTP_USER_MASTER') == 'master'
 
 
-def test_upload_directory(tmp_path):
-    fake = FakeFTP()
+def test_upload_directory(fake_ftp, tmp_path):
     src = tmp_path / 'srcdir'
     sub = src / 'sub'
     sub.mkdir(parents=True)
     (src / 'a.txt').write_text('1')
     (sub / 'b.txt').write_text('2')
-    assert FTP_Connection.upload_directory(fake, str(src), '/dest', False, '', lambda *a: None)
-    assert fake.stored['/dest/a.txt'] == b'1'
-    assert fake.stored['/dest/sub/b.txt'] == b'2'
+    assert FTP_Connection.upload_directory(fake_ftp, str(src), '/dest', False, '', lambda *a: None)
+    assert fake_ftp.stored['/dest/a.txt'] == b'1'
+    assert fake_ftp.stored['/dest/sub/b.txt'] == b'2'
 
 
-def test_download_directory(tmp_path):
-    fake = FakeFTP()
-    fake.dirs.update({'/folder', '/folder/sub'})
-    fake.files['/folder/a.txt'] = b'1'
-    fake.files['/folder/sub/b.txt'] = b'2'
+def test_download_directory(fake_ftp, tmp_path):
+    fake_ftp.dirs.update({'/folder', '/folder/sub'})
+    fake_ftp.files['/folder/a.txt'] = b'1'
+    fake_ftp.files['/folder/sub/b.txt'] = b'2'
     out = tmp_path / 'out'
-    assert FTP_Connection.download_directory(fake, '/folder', str(out), False, '', lambda *a: None)
+    assert FTP_Connection.download_directory(fake_ftp, '/folder', str(out), False, '', lambda *a: None)
     assert (out / 'a.txt').read_text() == '1'
     assert (out / 'sub' / 'b.txt').read_text() == '2'
+
+
+def test_xor_cipher_streaming_matches_one_shot():
+    data = bytes(range(256)) * 50
+    cipher = FTP_Connection.XorCipher('chave')
+    chunks = [cipher.process(data[i:i + 333]) for i in range(0, len(data), 333)]
+    expected = bytes(b ^ b'chave'[i % 5] for i, b in enumerate(data))
+    assert b''.join(chunks) == expected
+    assert FTP_Connection.xor_cipher(data[1000:], 'chave', 1000) == expected[1000:]
+
+
+def test_upload_file_encrypted_streams_in_blocks(fake_ftp, tmp_path):
+    payload = os.urandom(50000)
+    src = tmp_path / 'big.bin'
+    src.write_bytes(payload)
+    progress = []
+    assert FTP_Connection.upload_file(
+        fake_ftp, str(src), 'big.bin', True, 'k', lambda curr, total: progress.append((curr, total))
+    )
+    assert fake_ftp.stored['big.bin'] == FTP_Connection.xor_cipher(payload, 'k')
+    assert len(progress) == 7
+    assert progress[-1] == (50000, 50000)
+
+
+def test_upload_file_resumes_partial_upload_with_keystream_offset(fake_ftp, tmp_path, monkeypatch):
+    monkeypatch.setattr(FTP_Connection, 'RESUME_MIN_SIZE', 0)
+    data = bytes(range(256)) * 100
+    cipher = FTP_Connection.xor_cipher(data, 'k3y')
+    src = tmp_path / 'big.bin'
+    src.write_bytes(data)
+    fake_ftp.files['big.bin.part'] = cipher[:10000]
+    progress = []
+    assert FTP_Connection.upload_file(fake_ftp, str(src), 'big.bin', True, 'k3y', lambda c, t: progress.append(c))
+    assert fake_ftp.stored == {'big.bin': cipher} and 'big.bin.part' not in fake_ftp.files
+    assert progress[0] > 10000 and progress[-1] == len(data)
+
+
+def test_upload_file_falls_back_to_direct_stor_when_rename_is_refused(fake_ftp, tmp_path, monkeypatch):
+    monkeypatch.setattr(FTP_Connection, 'RESUME_MIN_SIZE', 0)
+    files = fake_ftp.files
+    rename = fake_ftp.rename
+
+    def size(filename):
+        if filename not in files:
+            raise error_perm('550 No such file or directory.')
+        return len(files[filename])
+
+    def refused_rename(src, dst):
+        # Usuário sem a permissão 'f': todo RNTO é recusado
+        raise error_perm('550 Not enough privileges.')
+
+    def windows_rename(src, dst):
+        if dst in files:
+            raise error_perm('550 Cannot create a file when that file already exists.')
+        rename(src, dst)
+
+    fake_ftp.size = size
+    fake_ftp.rename = refused_rename
+    src = tmp_path / 'big.bin'
+    src.write_bytes(b'new data')
+    for existing in ({'big.bin': b'old'}, {}):
+        files.clear()
+        files.update(existing)
+        assert FTP_Connection.upload_file(fake_ftp, str(src), 'big.bin')
+        assert files == {'big.bin': b'new data'}
+
+    # RNTO do Windows sobre um destino existente: remove e renomeia
+    fake_ftp.rename = windows_rename
+    files['big.bin'] = b'old'
+    deleted = []
+    delete = fake_ftp.delete
+    fake_ftp.delete = lambda path: deleted.append(path) or delete(path)
+    assert FTP_Connection.upload_file(fake_ftp, str(src), 'big.bin')
+    assert files == {'big.bin': b'new data'} and deleted == ['big.bin']
+
+
+def test_download_file_resumes_from_local_part(fake_ftp, tmp_path):
+    data = bytes(range(256)) * 100
+    fake_ftp.files['big.bin'] = FTP_Connection.xor_cipher(data, 'k3y')
+    (tmp_path / 'big.bin.part').write_bytes(data[:12345])
+    rests = []
+    retr = fake_ftp.retrbinary
+    fake_ftp.retrbinary = lambda cmd, cb, blocksize=8192, rest=None: rests.append(rest) or retr(cmd, cb, blocksize, rest)
+    assert FTP_Connection.download_file(fake_ftp, 'big.bin', str(tmp_path), True, 'k3y')
+    assert rests == [12345]
+    assert (tmp_path / 'big.bin').read_bytes() == data
+    assert not (tmp_path / 'big.bin.part').exists()
+
+
+def test_download_file_encrypted_decrypts_each_block(fake_ftp, tmp_path):
+    payload = os.urandom(30000)
+    fake_ftp.files['big.bin'] = FTP_Connection.xor_cipher(payload, 'chave')
+    assert FTP_Connection.download_file(fake_ftp, 'big.bin', str(tmp_path), True, 'chave')
+    assert (tmp_path / 'big.bin').read_bytes() == payload
+
+
+def test_session_pool_reuses_health_checks_and_reconnects(session_pool):
+    pool = session_pool(size=2, health_check_interval=0)
+    with pool.session() as first:
+        pass
+    with pool.session() as again:
+        assert again is first and first.noops == 1
+
+    first.alive = False
+    with pool.session() as replaced:
+        assert replaced is not first
+    assert len(session_pool.sessions) == 2
+
+    a = pool.acquire()
+    b = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.01)
+    pool.release(a, broken=True)
+    c = pool.acquire(timeout=0.01)
+    assert c is not a and not a.alive
+    pool.release(b)
+    pool.release(c)
+    pool.close()
+    assert not b.alive and not c.alive
+
+
+def test_transfer_queue_orders_aggregates_and_cancels(session_pool):
+    pool = session_pool()
+    order = []
+
+    def fake_transfer(ftp, name, size, encryption_enabled=False, key='', progress_callback=None):
+        order.append(name)
+        progress_callback(size // 2, size)
+        progress_callback(size, size)
+        return name != 'bad'
+
+    queue = FTP_Connection.TransferQueue(pool, order='largest')
+    for name, size in [('small', 10), ('big', 1000), ('bad', 100)]:
+        queue.add(fake_transfer, name, size, size=size, name=name)
+    queue.run()
+    assert order == ['big', 'bad', 'small']
+    assert (queue.bytes_done, queue.bytes_total) == (1110, 1110)
+    assert queue.failed == ['bad']
+    assert len(session_pool.sessions) == 2
+
+    cancelled = FTP_Connection.TransferQueue(pool)
+    cancelled.add(fake_transfer, 'never', 5, size=5)
+    cancelled.cancel()
+    assert cancelled.run() == [('never', False)]
+    assert order == ['big', 'bad', 'small']
+
+
+def test_transfer_queue_retries_when_no_session_can_be_acquired(session_pool):
+    def connect(self, host, port):
+        raise ConnectionRefusedError('connection refused')
+
+    pool = session_pool(connect=connect)
+    queue = FTP_Connection.TransferQueue(pool, retries=2, backoff=0)
+    queue.add(lambda ftp, *args, **kwargs: True, 'file.bin', size=10)
+    assert queue.run() == [('file.bin', False)]
+    assert queue.completed == 1 and queue.bytes_done == 0
+
+
+def test_upload_directory_parallel_creates_missing_dirs_and_retries(fake_ftp, session_pool, tmp_path, monkeypatch):
+    monkeypatch.setattr(FTP_Connection, 'RETRY_BACKOFF', 0)
+    fake_ftp.dirs.update({'/dest', '/dest/old'})
+    made = []
+    fake_ftp.mkd = lambda path: (made.append(path), fake_ftp.dirs.add(path))
+    flaky = {'/dest/sub/b.txt': 1}
+
+    def storbinary(self, cmd, *args, **kwargs):
+        name = cmd.split()[1]
+        if flaky.get(name):
+            flaky[name] -= 1
+            raise EOFError('connection lost')
+        return self.shared.storbinary(cmd, *args, **kwargs)
+
+    src = tmp_path / 'srcdir'
+    (src / 'old').mkdir(parents=True)
+    (src / 'sub' / 'deep').mkdir(parents=True)
+    for rel, text in [('a.txt', '1'), ('old/c.txt', '3'), ('sub/b.txt', '22'), ('sub/deep/d.txt', '4')]:
+        (src / rel).write_text(text)
+
+    pool = session_pool(size=2, shared=fake_ftp, storbinary=storbinary)
+    progress = []
+    assert FTP_Connection.upload_directory(
+        fake_ftp, str(src), '/dest', progress_callback=lambda c, t: progress.append((c, t)), pool=pool
+    )
+    assert made == ['/dest/sub', '/dest/sub/deep']
+    assert fake_ftp.stored == {
+        '/dest/a.txt': b'1', '/dest/old/c.txt': b'3', '/dest/sub/b.txt': b'22', '/dest/sub/deep/d.txt': b'4'
+    }
+    assert progress[-1] == (5, 5)
+
+
+def test_download_directory_parallel_uses_mlsd_sizes(fake_ftp, session_pool, tmp_path):
+    fake_ftp.dirs.update({'/folder', '/folder/sub', '/folder/sub/empty'})
+    fake_ftp.files.update({'/folder/a.txt': b'1', '/folder/sub/b.txt': b'22', '/folder/sub/c.txt': b'333'})
+
+    pool = session_pool(size=3, shared=fake_ftp)
+    progress = []
+    out = tmp_path / 'out'
+    assert FTP_Connection.download_directory(
+        fake_ftp, '/folder', str(out), progress_callback=lambda c, t: progress.append((c, t)), pool=pool
+    )
+    assert (out / 'a.txt').read_text() == '1'
+    assert (out / 'sub' / 'b.txt').read_text() == '22'
+    assert (out / 'sub' / 'c.txt').read_text() == '333'
+    assert (out / 'sub' / 'empty').is_dir()
+    assert progress[0][1] == 6 and progress[-1] == (6, 6)
+    assert getattr(fake_ftp, 'size_calls', 0) == 0
+
+
+def test_download_file_segmented_splits_ranges_and_recovers_failed_segment(session_pool, tmp_path, monkeypatch):
+    monkeypatch.setattr(FTP_Connection, 'SEGMENT_MIN_SIZE', 1000)
+    data = bytes(range(256)) * 40
+    remote = FTP_Connection.xor_cipher(data, 'k3y')
+    rests = []
+    parts = []
+
+    class Conn:
+        def __init__(self, session, pos):
+            self.session, self.pos = session, pos
+
+        def recv(self, size):
+            # O .part de download_file nunca recebe a pré-alocação
+            parts.append((tmp_path / 'big.bin.part').exists())
+            if self.session.fail_after is not None and self.pos >= self.session.fail_after:
+                # Falha só depois que as outras sessões já terminaram suas faixas
+                time.sleep(0.05)
+                self.session.fail_after = None
+                raise ConnectionResetError('lost')
+            chunk = remote[self.pos:self.pos + min(size, 700)]
+            self.pos += len(chunk)
+            return chunk
+
+        def close(self):
+            pass
+
+    def transfercmd(self, cmd, rest=None):
+        rests.append(rest or 0)
+        self.transfers += 1
+        return Conn(self, rest or 0)
+
+    def voidresp(self):
+        self.replies += 1
+        return '226 ok'
+
+    pool = session_pool(
+        size=4, transfercmd=transfercmd, voidresp=voidresp, fail_after=None, transfers=0, replies=0
+    )
+    first = pool.acquire()
+    first.fail_after = 1500
+    progress = []
+    assert FTP_Connection.download_file_segmented(
+        first, 'big.bin', str(tmp_path), True, 'k3y', lambda c, t: progress.append((c, t)),
+        remote_size=len(data), pool=pool,
+    )
+    assert (tmp_path / 'big.bin').read_bytes() == data
+    assert sorted(rests) == [0, 2100, 2560, 5120, 7680]
+    assert progress[-1] == (len(data), len(data))
+    # A sessão do chamador leu a resposta da faixa que falhou
+    assert first.transfers == first.replies == 1
+    assert not any(parts) and sorted(os.listdir(tmp_path)) == ['big.bin']
+
+
+def test_download_file_segmented_failure_leaves_nothing_to_resume(fake_ftp, session_pool, tmp_path, monkeypatch):
+    monkeypatch.setattr(FTP_Connection, 'SEGMENT_MIN_SIZE', 1000)
+
+    class LostConn:
+        def recv(self, size):
+            raise ConnectionResetError('lost')
+
+        def close(self):
+            pass
+
+    def voidresp(self):
+        raise error_perm('426 Connection closed; transfer aborted.')
+
+    pool = session_pool(size=2, transfercmd=lambda self, cmd, rest=None: LostConn(), voidresp=voidresp)
+    assert not FTP_Connection.download_file_segmented(
+        pool.acquire(), 'big.bin', str(tmp_path), remote_size=4000, pool=pool, retries=0
+    )
+    assert os.listdir(tmp_path) == []
+
+    fake_ftp.files['big.bin'] = b'x' * 4000
+    assert FTP_Connection.download_file(fake_ftp, 'big.bin', str(tmp_path))
+    assert (tmp_path / 'big.bin').read_bytes() == b'x' * 4000
+
+
+def test_remote_listing_caches_pages_and_invalidates_after_upload(fake_ftp, tmp_path, monkeypatch):
+    fake_ftp.dirs.add('sub')
+    fake_ftp.files.update({'a.bin': b'a', 'b.bin': b'bb'})
+    calls = []
+    mlsd = fake_ftp.mlsd
+    fake_ftp.mlsd = lambda path, facts=None: calls.append(path) or mlsd(path, facts)
+    now = [0.0]
+    listing = FTP_Connection.RemoteListing(ttl=10, clock=lambda: now[0])
+
+    assert [name for name, _ in listing.stream(fake_ftp)] == ['a.bin', 'b.bin', 'sub']
+    assert listing.page(fake_ftp, '.', page=1, page_size=2) == ([('sub', {'type': 'dir'})], 3)
+    assert calls == ['.']
+    now[0] = 11
+    listing.entries(fake_ftp)
+    assert calls == ['.', '.']
+
+    monkeypatch.setattr(FTP_Connection, 'remote_listing', listing)
+    assert FTP_Connection.list_files(fake_ftp) == ['a.bin', 'b.bin']
+    local = tmp_path / 'c.bin'
+    local.write_bytes(b'ccc')
+    FTP_Connection.upload_file(fake_ftp, str(local), 'c.bin')
+    assert FTP_Connection.list_files(fake_ftp) == ['a.bin', 'b.bin', 'c.bin']
+    assert FTP_Connection.list_file_sizes(fake_ftp) == {'a.bin': 1, 'b.bin': 2, 'c.bin': 3}
+    assert calls == ['.', '.', '.']
+
+    def no_mlsd(path, facts=None):
+        raise error_perm('500 Unknown command')
+        yield
+
+    fake_ftp.mlsd = no_mlsd
+    fake_ftp.nlst = lambda path: ['./a.bin', './sub']
+    listing.clear()
+    assert listing.entries(fake_ftp) == [('a.bin', {}), ('sub', {})]
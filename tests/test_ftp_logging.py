@@ -0,0 +1,28 @@
+import json
+import logging
+import queue
+
+import FTP_logging
+
+
+def test_logging_pipeline_samples_defers_formatting_and_emits_json():
+    sampler = FTP_logging.SamplingFilter({'transfer': 3, 'login': 1})
+    records = [
+        logging.LogRecord('ftp', logging.INFO, __file__, 0, 'arquivo %s', (i,), None) for i in range(6)
+    ]
+    for record in records:
+        record.event = 'transfer'
+    assert [sampler.filter(r) for r in records] == [True, False, False, True, False, False]
+    records[1].levelno = logging.WARNING
+    assert sampler.filter(records[1])
+
+    handler = FTP_logging.DroppingQueueHandler(queue.Queue(1))
+    handler.handle(records[0])
+    handler.handle(records[2])
+    queued = handler.queue.get_nowait()
+    assert handler.dropped == 1
+    assert queued.msg == 'arquivo %s' and queued.args == (0,)
+
+    line = json.loads(FTP_logging.JsonFormatter().format(queued))
+    assert line['message'] == 'arquivo 0'
+    assert line['level'] == 'INFO' and line['event'] == 'transfer'
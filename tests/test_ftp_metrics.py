@@ -0,0 +1,30 @@
+import urllib.request
+
+import pytest
+
+import FTP_metrics
+
+
+def test_metrics_registry_renders_prometheus_text():
+    registry = FTP_metrics.MetricsRegistry()
+    logins = registry.counter('ftp_logins_total', 'Logins', ['result'])
+    latency = registry.histogram('ftp_command_duration_seconds', 'Latência', ['command'], buckets=(0.1, 1.0))
+    logins.labels('success').inc()
+    logins.labels('bad"\n').inc(2)
+    latency.labels('RETR').observe(0.05)
+    latency.labels('RETR').observe(0.5)
+    with pytest.raises(ValueError):
+        logins.labels()
+
+    server = FTP_metrics.start_metrics_server(registry, port=0)
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.server_address[1]}/metrics') as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+    assert '# TYPE ftp_logins_total counter' in body
+    assert 'ftp_logins_total{result="success"} 1\n' in body
+    assert 'ftp_logins_total{result="bad\\"\\n"} 2\n' in body
+    assert 'ftp_command_duration_seconds_bucket{command="RETR",le="0.1"} 1\n' in body
+    assert 'ftp_command_duration_seconds_bucket{command="RETR",le="+Inf"} 2\n' in body
+    assert 'ftp_command_duration_seconds_count{command="RETR"} 2\n' in body
@@ -0,0 +1,326 @@
+import concurrent.futures
+import os
+import select
+import tempfile
+import threading
+import types
+
+import pytest
+
+import FTP_server
+from FTP_cipher import xor_cipher
+
+
+def test_encrypted_file_roundtrip_with_append_and_seek(tmp_path):
+    target = tmp_path / 'stored.bin'
+    payload = os.urandom(5000)
+    stored = FTP_server.EncryptedFile(open(target, 'wb'), 'chave')
+    stored.write(payload[:1234])
+    stored.close()
+    appended = FTP_server.EncryptedFile(open(target, 'ab'), 'chave')
+    appended.write(payload[1234:])
+    appended.close()
+    assert target.read_bytes() == xor_cipher(payload, 'chave')
+
+    reader = FTP_server.EncryptedFile(open(target, 'rb'), 'chave')
+    reader.seek(777)
+    assert reader.read(1000) + reader.read() == payload[777:]
+    reader.close()
+
+
+class DiskFS:
+    """Stand-in for pyftpdlib's AbstractedFS (stubbed in conftest) over the real disk.
+
+    Like AbstractedFS, LIST renders with ``lstat`` and MLSD/MLST with ``stat``.
+    """
+
+    def __init__(self, root, cmd_channel):
+        self.root, self.cmd_channel = root, cmd_channel
+
+    def open(self, filename, mode):
+        return open(filename, mode)
+
+    def mkstemp(self, suffix='', prefix='', dir=None, mode='wb'):
+        fd, name = tempfile.mkstemp(suffix, prefix, dir)
+        os.close(fd)
+        return open(name, mode)
+
+    def lstat(self, path):
+        return os.lstat(path)
+
+    def stat(self, path):
+        return os.stat(path)
+
+    def format_list(self, basedir, listing, ignore_err=True):
+        for name in listing:
+            yield f'{self.lstat(os.path.join(basedir, name)).st_size} {name}\r\n'.encode()
+
+    def format_mlsx(self, basedir, listing, perms, facts, ignore_err=True):
+        for name in listing:
+            yield f'size={self.stat(os.path.join(basedir, name)).st_size}; {name}\r\n'.encode()
+
+
+def test_encrypted_fs_encrypts_stor_and_stou_uploads(tmp_path):
+    class FS(FTP_server.EncryptedFS, DiskFS):
+        key = 'chave'
+
+    fs = FS(str(tmp_path), None)
+    stored = fs.open(str(tmp_path / 'stor.bin'), 'wb')
+    stored.write(b'plainSTOR')
+    stored.close()
+    unique = fs.mkstemp(prefix='ftpd.', dir=str(tmp_path))
+    unique.write(b'plainSTOU')
+    unique.close()
+
+    for path, data in ((str(tmp_path / 'stor.bin'), b'plainSTOR'), (unique.name, b'plainSTOU')):
+        with open(path, 'rb') as f:
+            assert f.read() == xor_cipher(data, 'chave')
+        reader = fs.open(path, 'rb')
+        assert reader.read() == data
+        reader.close()
+
+
+def test_shared_connection_limiter_enforces_global_limits():
+    limiter = FTP_server.SharedConnectionLimiter(3, 2)
+    assert limiter.acquire('10.0.0.1') is None
+    assert limiter.acquire('10.0.0.1') is None
+    assert 'same IP' in limiter.acquire('10.0.0.1')
+    assert limiter.acquire('10.0.0.2') is None
+    assert 'Too many connections' in limiter.acquire('10.0.0.3')
+    limiter.release('10.0.0.1')
+    assert limiter.acquire('10.0.0.3') is None
+    assert limiter.counts == {'__total__': 3, '10.0.0.1': 1, '10.0.0.2': 1, '10.0.0.3': 1}
+
+
+def test_ip_access_list_matches_addresses_and_cidr_ranges():
+    acl = FTP_server.IPAccessList(
+        ['127.0.0.1', '10.1.0.0/16', ' 2001:db8::/32', 'fe80::1', '', 'not-an-ip']
+    )
+    assert '127.0.0.1' in acl
+    assert '10.1.255.7' in acl
+    assert '10.2.0.1' not in acl
+    assert '2001:db8:abcd::42' in acl
+    assert 'FE80:0::1' in acl
+    assert '::ffff:10.1.2.3' in acl
+    assert 'garbage' not in acl
+    assert '192.168.0.1' not in FTP_server.IPAccessList([''])
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = FTP_server.LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert (cache.hits, cache.misses, len(cache)) == (3, 1, 2)
+
+
+def test_path_jail_rejects_siblings_and_symlink_escapes(tmp_path):
+    root = tmp_path / 'jail'
+    (root / 'sub').mkdir(parents=True)
+    (tmp_path / 'jail2').mkdir()
+    (root / 'escape').symlink_to(tmp_path / 'jail2')
+    jail = FTP_server.PathJail(str(root))
+    assert jail.contains(str(root))
+    assert jail.contains(str(root / 'sub' / 'new.txt'))
+    assert jail.contains(str(root / 'sub' / '..' / 'file'))
+    assert not jail.contains(str(tmp_path / 'jail2' / 'file'))
+    assert not jail.contains(str(root / 'escape'))
+    assert not jail.contains(str(root / 'escape' / 'file'))
+    assert not jail.contains(str(root / '..' / 'outside'))
+
+    # Diretório removido ou renomeado e trocado por um link para fora da jaula
+    (root / 'sub' / 'inner').mkdir()
+    assert jail.contains(str(root / 'sub' / 'inner' / 'file'))
+    os.rename(root / 'sub', root / 'moved')
+    (root / 'sub').symlink_to(tmp_path / 'jail2')
+    generation = jail.generation
+    jail.forget(str(root / 'sub'))
+    assert jail.generation == generation + 1
+    assert not jail.contains(str(root / 'sub' / 'inner' / 'file'))
+    (root / 'moved' / 'inner').rmdir()
+    (root / 'moved' / 'inner').symlink_to(tmp_path / 'jail2')
+    assert jail.contains(str(root / 'moved' / 'new.txt'))
+    jail.forget(str(root / 'moved' / 'inner'))
+    assert not jail.contains(str(root / 'moved' / 'inner' / 'file'))
+
+
+def test_sqlite_authorizer_validates_hashed_passwords(tmp_path):
+    store = FTP_server.UserStore(str(tmp_path / 'users.db'), iterations=1000)
+    store.add_user('alice', 's3cret', str(tmp_path), 'elr')
+    assert 's3cret' not in store.get_user('alice')['password_hash']
+
+    auth = FTP_server.SQLiteAuthorizer(store, cache_size=10, ttl=60)
+    auth.validate_authentication('alice', 's3cret', None)
+    assert auth.check_cached_credentials('alice', 's3cret')
+    for user, password in [('alice', 'wrong'), ('bob', 's3cret')]:
+        with pytest.raises(FTP_server.AuthenticationFailed):
+            auth.validate_authentication(user, password, None)
+    assert auth.has_perm('alice', 'r') and not auth.has_perm('alice', 'w')
+
+    store.add_user('alice', 'new-pass', str(tmp_path), 'elradfmw')
+    assert auth.check_cached_credentials('alice', 's3cret')
+    auth.reload()
+    assert not auth.check_cached_credentials('alice', 's3cret')
+    auth.validate_authentication('alice', 'new-pass', None)
+    assert auth.has_perm('alice', 'w')
+
+
+def test_login_throttle_backs_off_per_ip_and_user(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(FTP_server.time, 'monotonic', lambda: now[0])
+    throttle = FTP_server.LoginThrottle(base_delay=1, max_delay=4)
+    assert throttle.retry_after('1.1.1.1', 'alice') == 0
+    for _ in range(4):
+        throttle.failed('1.1.1.1', 'alice')
+    assert throttle.retry_after('1.1.1.1', 'bob') == 4
+    # Um IP sem falhas não é bloqueado pelas falhas de outro IP no mesmo usuário
+    assert throttle.retry_after('2.2.2.2', 'alice') == 0
+    throttle.failed('3.3.3.3', 'alice')
+    assert throttle.retry_after('3.3.3.3', 'alice') == 4
+    assert throttle.retry_after('3.3.3.3', 'bob') == 1
+    now[0] += 4
+    assert throttle.retry_after('1.1.1.1', 'alice') == 0
+    throttle.succeeded('1.1.1.1', 'alice')
+    throttle.failed('1.1.1.1', 'alice')
+    assert throttle.retry_after('1.1.1.1', 'alice') == 4
+    assert throttle.retry_after('1.1.1.1', 'bob') == 1
+
+
+def test_auth_worker_pool_bounds_pending_jobs():
+    release = threading.Event()
+    pool = FTP_server.AuthWorkerPool(1, max_pending=2)
+    first = pool.submit(release.wait)
+    second = pool.submit(release.wait)
+    assert pool.submit(release.wait) is None
+    release.set()
+    assert first.result() and second.result()
+
+
+def test_loop_wakeup_wakes_the_loop_only_when_the_future_is_done():
+    registered = {}
+
+    class Loop:
+        READ = 1
+
+        def register(self, fd, instance, events):
+            registered[fd] = instance
+
+        def unregister(self, fd):
+            del registered[fd]
+
+    future = concurrent.futures.Future()
+    calls = []
+    FTP_server.LoopWakeup(Loop(), future, lambda: calls.append('login'))
+    (fd, wakeup), = registered.items()
+    assert select.select([fd], [], [], 0.05)[0] == []
+    threading.Thread(target=future.set_result, args=(True,)).start()
+    assert select.select([fd], [], [], 5)[0] == [fd]
+    wakeup.handle_read_event()
+    assert calls == ['login'] and registered == {}
+
+
+def test_bandwidth_scheduler_token_buckets_and_fair_share():
+    now = [0.0]
+    clock = lambda: now[0]
+    assert FTP_server.parse_byte_rate('512K') == 524288
+    assert FTP_server.parse_user_bandwidth('guest:1M:256K, bad') == {'guest': (1048576, 262144)}
+
+    scheduler = FTP_server.BandwidthScheduler(
+        user_limits=(0, 1000), user_overrides={'master': (0, 0)}, global_limits=(0, 600), clock=clock
+    )
+    assert scheduler.enabled
+    assert scheduler.rates('master', '10.0.0.1', 'write') == (0, 0, 600)
+
+    a = scheduler.register('a', 'guest', '10.0.0.1', 'write')
+    assert FTP_server.BandwidthScheduler.consume(a, 600) == 0.0
+    assert FTP_server.BandwidthScheduler.consume(a, 300) == 0.5
+    b = scheduler.register('b', 'guest', '10.0.0.2', 'write')
+    assert a[0] is b[0] and a[1].rate == b[1].rate == 300
+    scheduler.unregister('b')
+    assert a[1].rate == 600
+    scheduler.unregister('a')
+    assert scheduler._buckets == {} and scheduler._shares['write'] == {}
+
+    now[0] = 1.0
+    c = scheduler.register('c', 'guest', '10.0.0.1', 'write')
+    assert FTP_server.BandwidthScheduler.consume(c, 1000) == 400 / 600
+
+
+def test_directory_listing_cache_checks_mtime_ttl_and_memory_bound(tmp_path):
+    now = [0.0]
+    entry = FTP_server.DirectoryListingCache.ENTRY_BYTES
+    cache = FTP_server.DirectoryListingCache(max_bytes=3 * entry + 20, ttl=10, clock=lambda: now[0])
+    big, small = tmp_path / 'big', tmp_path / 'small'
+    big.mkdir()
+    small.mkdir()
+    for name in ('a', 'b'):
+        (big / name).write_bytes(b'x' * 3)
+    (small / 'c').write_bytes(b'')
+
+    names, stats, hit = cache.listing(str(big))
+    assert sorted(names) == ['a', 'b'] and stats['a'].st_size == 3 and not hit
+    assert cache.listing(str(big))[2]
+    (big / 'd').write_bytes(b'')
+    os.utime(big, ns=(0, os.stat(big).st_mtime_ns + 1))
+    names = cache.listing(str(big))[0]
+    assert sorted(names) == ['a', 'b', 'd']
+    assert (cache.hits, cache.misses, cache.size) == (1, 2, 3 * entry)
+
+    render = lambda: iter([b'a\r\n', b'b\r\n', b'd\r\n'])
+    assert cache.rendered(str(big), names, 'LIST', render) == [b'a\r\nb\r\nd\r\n']
+    assert cache.rendered(str(big), names, 'LIST', lambda: pytest.fail('re-rendered')) == [b'a\r\nb\r\nd\r\n']
+    assert cache.size == 3 * entry + 9
+    # Um variante que estoura o limite é entregue mas não fica no cache
+    cache.rendered(str(big), names, 'MLSD', lambda: iter([b'x' * 20]))
+    assert list(cache.dirs[str(big)][4]) == ['LIST'] and cache.size == 3 * entry + 9
+    # Listagens grandes seguem sob demanda, sem montar nem guardar a saída
+    cache.max_rendered = 2
+    lazy = cache.rendered(str(big), names, 'NLST', render)
+    assert not isinstance(lazy, list) and list(lazy) == [b'a\r\n', b'b\r\n', b'd\r\n']
+    assert list(cache.dirs[str(big)][4]) == ['LIST']
+
+    cache.listing(str(small))
+    assert list(cache.dirs) == [str(small)] and cache.size == entry
+    now[0] = 11
+    assert not cache.listing(str(small))[2]
+    cache.invalidate_parent(str(small / 'c'))
+    assert cache.dirs == {} and cache.size == 0
+
+
+def test_cached_fs_uses_cached_stats_only_while_rendering_listing(tmp_path):
+    class FS(FTP_server.CachedFS, DiskFS):
+        cache = FTP_server.DirectoryListingCache()
+
+    fs = FS(str(tmp_path), types.SimpleNamespace(use_gmt_times=True))
+    path = str(tmp_path / 'a.bin')
+    (tmp_path / 'a.bin').write_bytes(b'x' * 300)
+    listing = fs.listdir(str(tmp_path))
+    assert b''.join(fs.format_mlsx(str(tmp_path), listing, 'elr', ['size'])) == b'size=300; a.bin\r\n'
+
+    # O STOR da própria sessão não muda o mtime do diretório
+    (tmp_path / 'a.bin').write_bytes(b'x' * 500)
+    assert fs.stat(path).st_size == 500
+    fs.listdir(str(tmp_path))
+    assert fs.lstat(path).st_size == fs.stat(path).st_size == 500
+    assert b''.join(fs.format_mlsx(str(tmp_path), ['a.bin'], 'elr', ['size'])) == b'size=500; a.bin\r\n'
+    assert fs._listing is None
+
+    # LIST reaproveita os stats da listagem em cache só durante a renderização
+    listing = fs.listdir(str(tmp_path))
+    assert b''.join(fs.format_list(str(tmp_path), listing)) == b'300 a.bin\r\n'
+    assert fs.lstat(path).st_size == 500
+    listing = fs.listdir(str(tmp_path))
+    fs.forget_listing()
+    assert b''.join(fs.format_list(str(tmp_path), listing)) == b'500 a.bin\r\n'
+
+    # Acima do limite a listagem é gerada sob demanda com o stat do disco
+    (tmp_path / 'b.bin').write_bytes(b'')
+    fs.cache.max_rendered = 1
+    listing = fs.listdir(str(tmp_path))
+    listing.sort()
+    lines = fs.format_list(str(tmp_path), listing)
+    assert isinstance(lines, types.GeneratorType)
+    assert b''.join(lines) == b'500 a.bin\r\n0 b.bin\r\n'
@@ -0,0 +1,52 @@
+import FTP_sync
+
+
+def test_sync_upload_sends_only_changed_files_and_skips_untouched_dirs(fake_ftp, tmp_path):
+    listed = []
+    mlsd = fake_ftp.mlsd
+    fake_ftp.mlsd = lambda path, facts=None: listed.append(path) or mlsd(path, facts)
+    src = tmp_path / 'src'
+    (src / 'sub').mkdir(parents=True)
+    (src / 'a.txt').write_text('1')
+    (src / 'sub' / 'b.txt').write_text('22')
+
+    assert FTP_sync.sync_upload(fake_ftp, str(src), '/dest')
+    assert sorted(fake_ftp.stored) == ['/dest/a.txt', '/dest/sub/b.txt']
+    assert (src / FTP_sync.SYNC_STATE_FILE).exists()
+
+    fake_ftp.stored.clear()
+    listed.clear()
+    assert FTP_sync.sync_upload(fake_ftp, str(src), '/dest')
+    assert fake_ftp.stored == {} and listed == []
+
+    (src / 'sub' / 'b.txt').write_text('333')
+    assert FTP_sync.sync_upload(fake_ftp, str(src), '/dest')
+    assert fake_ftp.stored == {'/dest/sub/b.txt': b'333'}
+    assert '/dest' not in listed
+
+
+def test_sync_download_keeps_local_files_when_remote_listing_fails(fake_ftp, tmp_path):
+    fake_ftp.dirs.update({'/src', '/src/sub'})
+    fake_ftp.files.update({'/src/a.txt': b'1', '/src/sub/b.txt': b'22'})
+    mlsd = fake_ftp.mlsd
+
+    def flaky_mlsd(path, facts=None):
+        if path == '/src/sub':
+            raise ConnectionResetError('lost')
+        return mlsd(path, facts)
+
+    fake_ftp.mlsd = flaky_mlsd
+    out = tmp_path / 'out'
+    (out / 'sub').mkdir(parents=True)
+    (out / 'sub' / 'b.txt').write_text('22')
+    (out / 'old.txt').write_text('x')
+
+    assert not FTP_sync.sync_download(fake_ftp, '/src', str(out), delete=True)
+    assert (out / 'a.txt').read_text() == '1'
+    assert (out / 'sub' / 'b.txt').read_text() == '22'
+    assert (out / 'old.txt').exists()
+    assert not (out / FTP_sync.SYNC_STATE_FILE).exists()
+
+    fake_ftp.mlsd = mlsd
+    assert FTP_sync.sync_download(fake_ftp, '/src', str(out), delete=True)
+    assert not (out / 'old.txt').exists() and (out / FTP_sync.SYNC_STATE_FILE).exists()